@@ -1,110 +1,858 @@
-from flask import Flask, jsonify, request
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from io import BytesIO
+import cProfile
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import random
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+from flask import Blueprint, Flask, Response, g, has_request_context, request, stream_with_context
+from flask import jsonify as _jsonify_flask
 import numpy as np
 import mysql.connector
+from mysql.connector import ClientFlag, pooling
+
+try:
+    import fcntl  # Bloqueo entre procesos del grafo compartido (solo Unix, como gunicorn)
+except ImportError:
+    fcntl = None
+
+from cache import CacheResultados
+from configuracion import DB_CONFIG, LIMITE_CIERRE, LIMITE_TABLA_RUTAS, TABLA_COORDENADAS
+from metricas import AlmacenPerfiles, Metricas
+from serializacion import (CODIFICACIONES, ProveedorJSON, a_json, codificar_filas, comprimir,
+                           comprimir_flujo, elegir_compresion)
+from grafo import (Grafo, abrir_snapshot, camino_punto_a_punto, caminos_desde,
+                   dijkstra_bidireccional, guardar_snapshot, reconstruir_camino)
+
+api = Blueprint('api', __name__)
+registro = logging.getLogger(__name__)
+
+# Base de datos, tablas y límites de la tabla de rutas y del cierre
+# (LIMITE_TABLA_RUTAS, LIMITE_CIERRE): ver configuracion.py, compartido con
+# DatosBD/ingesta.py. Matrices densas de /api/matrices solo hasta este
+# número de lugares.
+LIMITE_MATRICES_DENSAS = 2000
+
+# Filas de matriz densa que se construyen a la vez al enviarlas por tramos
+BLOQUE_FILAS = 256
+
+# Cálculo por lotes: máximo de pares por petición y orígenes a partir de los
+# cuales se reparte el trabajo en un pool de procesos
+MAX_PARES_LOTE = 100000
+UMBRAL_LOTE_PARALELO = 64
+
+# Pool de conexiones a MySQL y recarga del grafo.
+# COLUMNA_ACTUALIZACION: columna de fecha de modificación en distancias_adyacencia
+# (p. ej. 'updated_at'); si existe, las recargas solo leen las filas cambiadas.
+# INTERVALO_RECARGA: segundos entre revisiones automáticas (0 = desactivado).
+POOL_SIZE = 5
+COLUMNA_ACTUALIZACION = None
+INTERVALO_RECARGA = 0
+TOKEN_ADMIN = os.environ.get('API_TOKEN_ADMIN')
+
+# Instantánea binaria en disco: si se define, el grafo se abre desde ahí
+# (mapeado en memoria) en lugar de consultar MySQL
+RUTA_SNAPSHOT = os.environ.get('GRAFO_SNAPSHOT')
+
+# Base SQLite local con el mismo esquema (distancias_adyacencia y, opcional,
+# TABLA_COORDENADAS) en lugar de MySQL: para pruebas y para benchmark.py
+RUTA_SQLITE = os.environ.get('GRAFO_SQLITE')
+
+# Con varios trabajadores (gunicorn) cada proceso tiene su propio GRAFO. Si se
+# define este directorio, quien cambia el grafo (POST /api/aristas, recargas)
+# lo deja ahí como instantánea y los demás la abren, mapeada en memoria, antes
+# de su siguiente petición. gunicorn.conf.py lo define con más de un trabajador.
+RUTA_COMPARTIDA = os.environ.get('GRAFO_COMPARTIDO')
+
+# Caché de resultados de /api/camino-minimo y /api/conectividad
+# (clave: endpoint, origen, destino y versión y fecha de creación del grafo:
+# dos instantáneas distintas pueden tener el mismo número de versión)
+CACHE_MAX_ENTRADAS = 10000
+CACHE_TTL = 300
+CACHE_CONSULTAS = CacheResultados(CACHE_MAX_ENTRADAS, CACHE_TTL)
+
+# Cuerpos ya serializados (y comprimidos) de respuestas que solo cambian con
+# la versión del grafo: /api/lugares, /api/componentes, /api/matrices?formato=aristas
+CACHE_SERIALIZADA = CacheResultados(32, 24 * 3600)
+
+# Compresión gzip/br según Accept-Encoding para cuerpos desde este tamaño
+MIN_BYTES_COMPRESION = 1024
+TIPOS_COMPRIMIBLES = {'application/json', 'application/x-ndjson', 'text/plain'}
+
+# Métricas por endpoint y fase (db, lookup, compute, serialize), exportadas
+# en /metrics con el formato de Prometheus
+METRICAS = Metricas()
+METRICAS.contador('api_peticiones_total', 'Peticiones atendidas por endpoint, método y estado')
+METRICAS.histograma('api_latencia_segundos', 'Duración total de la petición, incluido el envío por tramos')
+METRICAS.histograma('api_fase_segundos', 'Duración de cada fase de la petición')
+METRICAS.contador('api_perfiles_total', 'Perfiles cProfile guardados, por motivo')
+METRICAS.indicador('grafo_version', 'Versión de la instantánea publicada')
+METRICAS.indicador('grafo_lugares', 'Lugares del grafo')
+METRICAS.indicador('grafo_aristas', 'Filas de distancias_adyacencia cargadas')
+METRICAS.indicador('grafo_componentes', 'Componentes fuertemente conexas')
+METRICAS.indicador('cache_entradas', 'Entradas en la caché de consultas')
+METRICAS.contador('cache_aciertos_total', 'Aciertos de la caché de consultas')
+METRICAS.contador('cache_fallos_total', 'Fallos de la caché de consultas')
+
+# Perfilado opcional con cProfile. ?perfil=1 o la cabecera X-Perfil: 1 (con
+# X-Admin-Token si hay token configurado) perfila esa petición y la guarda
+# siempre; además se perfila al azar una fracción TASA_MUESTREO_PERFIL de las
+# peticiones y se guardan las que tardan más de UMBRAL_PERFIL_LENTO segundos.
+# Solo se perfila una petición a la vez.
+TASA_MUESTREO_PERFIL = float(os.environ.get('API_MUESTREO_PERFIL', '0'))
+UMBRAL_PERFIL_LENTO = 0.5
+MAX_PERFILES = 50
+PERFILES = AlmacenPerfiles(MAX_PERFILES, os.environ.get('API_DIRECTORIO_PERFILES'))
+_BLOQUEO_PERFIL = threading.Lock()
+
+# Cálculos pesados (búsquedas de caminos sin tabla y lotes): como mucho
+# LIMITE_CALCULOS a la vez por proceso; el resto espera hasta ESPERA_CALCULO
+# segundos y si no recibe 503. Con PROCESOS_CALCULO > 0 se ejecutan en un pool
+# de procesos, así el hilo que atiende la petición suelta el GIL mientras
+# espera y las consultas baratas (/api/lugares, /api/conectividad) no se frenan.
+LIMITE_CALCULOS = int(os.environ.get('API_LIMITE_CALCULOS', os.cpu_count() or 1))
+ESPERA_CALCULO = 2.0
+PROCESOS_CALCULO = int(os.environ.get('API_PROCESOS_CALCULO', '0'))
+# Los procesos del pool heredan el grafo con fork: con spawn o forkserver
+# (este último es el predeterminado en Linux desde Python 3.14) cada uno
+# recibiría una copia serializada, tablas n² incluidas. Se bifurca desde un
+# trabajador con hilos (gthread), que solo es seguro porque los procesos del
+# pool no tocan nada que otro hilo pudiera tener bloqueado (registro, pool de
+# MySQL, cachés): solo recorren los arreglos del grafo. Python 3.12+ avisa
+# de ello con un DeprecationWarning. Sin fork (Windows) queda el predeterminado.
+CONTEXTO_CALCULO = (multiprocessing.get_context('fork')
+                    if 'fork' in multiprocessing.get_all_start_methods() else None)
+
+# Instantánea inmutable del grafo; las peticiones toman la referencia una vez.
+# Con gunicorn --preload se carga en el proceso maestro antes de bifurcar y
+# los trabajadores comparten sus páginas (copia al escribir, o el mapeo de la
+# instantánea en disco)
+GRAFO = None
+_POOL = None
+_PID_POOL = None
+_PID_RECARGA = None
+_CALCULOS = threading.BoundedSemaphore(LIMITE_CALCULOS)
+_POOL_CALCULO = None
+_BLOQUEO_POOL_CALCULO = threading.Lock()
+_BLOQUEO_RECARGA = threading.Lock()
+_ULTIMA_ACTUALIZACION = None
+_FILAS_EN_MARCA = frozenset()
+_COMPARTIDO_VISTO = None
+
+def _publicar(nuevo):
+    """Reemplaza la instantánea global y descarta los resultados en caché de la anterior"""
+    global GRAFO
+    GRAFO = nuevo
+    CACHE_CONSULTAS.limpiar()
+    CACHE_SERIALIZADA.limpiar()
+    return nuevo
+
+class _CursorSQLite:
+    """Cursor sqlite3 que acepta los marcadores %s de mysql.connector"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, consulta, parametros=()):
+        self._cursor.execute(consulta.replace('%s', '?'), parametros)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+class _ConexionSQLite:
+    def __init__(self, ruta):
+        self._conn = sqlite3.connect(ruta)
+
+    def cursor(self):
+        return _CursorSQLite(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
 
-app = Flask(__name__)
+# Errores de cualquiera de los dos motores
+ERRORES_BD = (mysql.connector.Error, sqlite3.Error)
 
-# Configuración de la base de datos
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '',
-    'database': 'quetzaltenango_grafo'
-}
+def obtener_conexion():
+    """Conexión tomada del pool o a RUTA_SQLITE.
 
-# Variables globales para almacenar los datos
-LUGARES = []
-MATRIZ_ADY = None
-MATRIZ_DIST = None
+    El pool se crea en el primer uso de cada proceso: las conexiones abiertas
+    por el maestro antes de bifurcar no se comparten con los trabajadores.
+    """
+    global _POOL, _PID_POOL
+    if RUTA_SQLITE:
+        return _ConexionSQLite(RUTA_SQLITE)
+    if _POOL is None or _PID_POOL != os.getpid():
+        # FOUND_ROWS: rowcount de un UPDATE cuenta las filas encontradas aunque
+        # no cambien sus valores (aplicar_cambios_aristas inserta si es 0)
+        _POOL = pooling.MySQLConnectionPool(pool_name="grafo", pool_size=POOL_SIZE,
+                                            client_flags=[ClientFlag.FOUND_ROWS], **DB_CONFIG)
+        _PID_POOL = os.getpid()
+    return _POOL.get_connection()
+
+def _max_actualizacion(cursor):
+    cursor.execute(f"SELECT MAX({COLUMNA_ACTUALIZACION}) FROM distancias_adyacencia")
+    return cursor.fetchone()[0]
+
+def _filas_en_marca(cursor, marca):
+    # Filas que ya tienen exactamente la marca: la próxima recarga las vuelve a
+    # leer (usa >=) y con este conjunto las reconoce como ya aplicadas
+    if marca is None:
+        return frozenset()
+    cursor.execute(
+        "SELECT origen, destino, distancia_km, adyacente FROM distancias_adyacencia "
+        f"WHERE {COLUMNA_ACTUALIZACION} = %s",
+        (marca,)
+    )
+    return frozenset(tuple(fila) for fila in cursor.fetchall())
+
+def _leer_coordenadas(conn):
+    """Coordenadas {lugar: (x, y)} de TABLA_COORDENADAS, o None si la tabla no existe"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT lugar, x, y FROM {TABLA_COORDENADAS}")
+        return {lugar: (float(x), float(y)) for lugar, x, y in cursor.fetchall()}
+    except ERRORES_BD:
+        return None
+    finally:
+        cursor.close()
 
 def cargar_datos():
     """Carga los datos desde la base de datos"""
-    global LUGARES, MATRIZ_ADY, MATRIZ_DIST
-    
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
-    
-    # Obtener lugares únicos
-    cursor.execute("SELECT DISTINCT origen FROM distancias_adyacencia ORDER BY origen")
-    LUGARES = [row['origen'] for row in cursor.fetchall()]
-    n = len(LUGARES)
-    
-    # Inicializar matrices
-    MATRIZ_ADY = np.zeros((n, n), dtype=int)
-    MATRIZ_DIST = np.zeros((n, n), dtype=float)
-    
-    # Llenar matrices
-    cursor.execute("SELECT origen, destino, distancia_km, adyacente FROM distancias_adyacencia")
-    for row in cursor.fetchall():
-        i = LUGARES.index(row['origen'])
-        j = LUGARES.index(row['destino'])
-        MATRIZ_ADY[i][j] = row['adyacente']
-        MATRIZ_DIST[i][j] = row['distancia_km']
-    
-    cursor.close()
-    conn.close()
-
-def warshall(matriz):
-    """Algoritmo de Warshall para matriz de conectividad"""
-    n = len(matriz)
-    matriz_c = np.copy(matriz)
-    
-    for k in range(n):
-        for i in range(n):
-            for j in range(n):
-                if matriz_c[i][k] and matriz_c[k][j]:
-                    matriz_c[i][j] = 1
-    return matriz_c
-
-def dijkstra(origen_idx, destino_idx):
-    """Algoritmo de Dijkstra para camino mínimo"""
-    n = len(MATRIZ_ADY)
-    dist = [float('inf')] * n
-    prev = [-1] * n
-    dist[origen_idx] = 0
-    no_visitados = set(range(n))
-    
-    while no_visitados:
-        u = min(no_visitados, key=lambda x: dist[x])
-        no_visitados.remove(u)
+    global _ULTIMA_ACTUALIZACION, _FILAS_EN_MARCA
+    
+    with fase('db'):
+        conn = obtener_conexion()
+        cursor = conn.cursor()
+        try:
+            # La marca se lee antes que las filas: lo que se confirme entre
+            # medio queda en la marca o por encima y la próxima recarga lo
+            # vuelve a leer (reaplicarlo es inocuo), en lugar de perderse
+            actualizacion = _max_actualizacion(cursor) if COLUMNA_ACTUALIZACION else None
+            en_marca = _filas_en_marca(cursor, actualizacion)
+            
+            # Obtener lugares únicos
+            cursor.execute("SELECT DISTINCT origen FROM distancias_adyacencia ORDER BY origen")
+            lugares = [row[0] for row in cursor.fetchall()]
+            
+            cursor.execute("SELECT origen, destino, distancia_km, adyacente FROM distancias_adyacencia")
+            filas = cursor.fetchall()
+            
+            coordenadas = _leer_coordenadas(conn)
+        finally:
+            cursor.close()
+            conn.close()
+    
+    _ULTIMA_ACTUALIZACION, _FILAS_EN_MARCA = actualizacion, en_marca
+    if GRAFO is not None and GRAFO.mismas_filas(lugares, filas) and \
+            GRAFO.mismas_coordenadas(coordenadas):
+        return GRAFO
+    
+    version = GRAFO.version + 1 if GRAFO is not None else 1
+    with fase('compute'):
+        nuevo = Grafo.desde_filas(lugares, filas, coordenadas=coordenadas, version=version,
+                                  limite_tabla=LIMITE_TABLA_RUTAS, limite_cierre=LIMITE_CIERRE)
+    return _publicar(nuevo)
+
+def recargar_datos(completa=False):
+    """Recarga el grafo y reemplaza la instantánea de forma atómica.
+
+    Con COLUMNA_ACTUALIZACION configurada solo se leen y aplican las filas
+    modificadas desde la última carga. Las filas borradas o los lugares nuevos
+    requieren una recarga completa. Devuelve (grafo, aristas_aplicadas).
+    """
+    global _ULTIMA_ACTUALIZACION, _FILAS_EN_MARCA
+    
+    with _BLOQUEO_RECARGA, _cambio_compartido():
+        anterior = GRAFO
+        if RUTA_SNAPSHOT:
+            nuevo = cargar_snapshot()
+            return nuevo, (0 if nuevo is anterior else nuevo.n_aristas)
+        if completa or anterior is None or not COLUMNA_ACTUALIZACION or _ULTIMA_ACTUALIZACION is None:
+            nuevo = cargar_datos()
+            return nuevo, (0 if nuevo is anterior else nuevo.n_aristas)
         
-        for v in range(n):
-            if MATRIZ_ADY[u][v] and MATRIZ_DIST[u][v] > 0:
-                nueva_dist = dist[u] + MATRIZ_DIST[u][v]
-                if nueva_dist < dist[v]:
-                    dist[v] = nueva_dist
-                    prev[v] = u
-    
-    # Reconstruir camino
-    camino = []
-    u = destino_idx
-    if prev[u] != -1 or u == origen_idx:
-        while u != -1:
-            camino.insert(0, LUGARES[u])
-            u = prev[u]
+        with fase('db'):
+            conn = obtener_conexion()
+            cursor = conn.cursor()
+            try:
+                # La nueva marca sale de las propias filas leídas: un MAX aparte
+                # podría pasar por encima de una fila confirmada entre ambas
+                # consultas y esa fila no se aplicaría nunca. Se lee con >=
+                # porque la columna suele tener resolución de un segundo: una
+                # fila confirmada después con la misma marca también vuelve
+                cursor.execute(
+                    f"SELECT origen, destino, distancia_km, adyacente, {COLUMNA_ACTUALIZACION} "
+                    f"FROM distancias_adyacencia WHERE {COLUMNA_ACTUALIZACION} >= %s",
+                    (_ULTIMA_ACTUALIZACION,)
+                )
+                leidas = cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+        
+        actualizacion = max((fila[4] for fila in leidas), default=_ULTIMA_ACTUALIZACION)
+        en_marca = frozenset(tuple(fila[:4]) for fila in leidas if fila[4] == actualizacion)
+        # Las filas de la marca anterior que siguen idénticas ya están aplicadas
+        cambios = [tuple(fila[:4]) for fila in leidas
+                   if fila[4] != _ULTIMA_ACTUALIZACION or tuple(fila[:4]) not in _FILAS_EN_MARCA]
+        if cambios:
+            try:
+                _publicar(_en_fase('compute', lambda: anterior.con_cambios(cambios)))
+            except KeyError:
+                # Apareció un lugar nuevo: el índice cambia y hay que reconstruir todo
+                return cargar_datos(), len(cambios)
+        _ULTIMA_ACTUALIZACION, _FILAS_EN_MARCA = actualizacion, en_marca
+        return GRAFO, len(cambios)
+
+def cargar_snapshot():
+    """Abre la instantánea de RUTA_SNAPSHOT (sin recalcular si no cambió de versión)"""
+    nuevo = abrir_snapshot(RUTA_SNAPSHOT)
+    if GRAFO is not None and GRAFO.version == nuevo.version and GRAFO.creado == nuevo.creado:
+        return GRAFO
+    return _publicar(nuevo)
+
+@contextmanager
+def _bloqueo_compartido(exclusivo, esperar=True):
+    """flock sobre <RUTA_COMPARTIDA>.lock (exclusivo para escribir, compartido
+    para abrir). Sin esperar, da False si otro proceso lo tiene tomado"""
+    with open(RUTA_COMPARTIDA.rstrip(os.sep) + '.lock', 'a') as f:
+        modo = fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH
+        try:
+            fcntl.flock(f, modo if esperar else modo | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _marca_compartida():
+    # Cada escritura crea un manifiesto nuevo: cambia el inodo aunque la
+    # fecha de modificación coincida
+    try:
+        estado = os.stat(os.path.join(RUTA_COMPARTIDA, 'manifiesto.json'))
+    except FileNotFoundError:
+        return None
+    return estado.st_ino, estado.st_mtime_ns
+
+def _adoptar_compartido():
+    """Publica la instantánea compartida si cambió desde la última vez que
+    este proceso la vio (con el bloqueo compartido o exclusivo tomado)"""
+    global _COMPARTIDO_VISTO, _ULTIMA_ACTUALIZACION, _FILAS_EN_MARCA
+    marca = _marca_compartida()
+    if marca is None or marca == _COMPARTIDO_VISTO:
+        return GRAFO
+    nuevo = abrir_snapshot(RUTA_COMPARTIDA)
+    # La marca de la última fila aplicada viaja con el grafo: si no, cada
+    # trabajador volvería a aplicar las mismas filas en su recarga
+    # (sin ella, la próxima recarga es completa)
+    try:
+        with open(os.path.join(RUTA_COMPARTIDA, 'actualizacion.pickle'), 'rb') as f:
+            _ULTIMA_ACTUALIZACION, _FILAS_EN_MARCA = pickle.load(f)
+    except FileNotFoundError:
+        _ULTIMA_ACTUALIZACION, _FILAS_EN_MARCA = None, frozenset()
+    _COMPARTIDO_VISTO = marca
+    if GRAFO is not None and GRAFO.version == nuevo.version and GRAFO.creado == nuevo.creado:
+        return GRAFO
+    return _publicar(nuevo)
+
+@contextmanager
+def _cambio_compartido():
+    """Serializa un cambio del grafo entre trabajadores: parte de la última
+    instantánea compartida y, si el cambio publica un grafo nuevo, lo deja
+    ahí para los demás. Sin RUTA_COMPARTIDA no hace nada."""
+    global _COMPARTIDO_VISTO
+    if not RUTA_COMPARTIDA:
+        yield
+        return
+    with _bloqueo_compartido(True):
+        _adoptar_compartido()
+        anterior = GRAFO
+        yield
+        if GRAFO is not anterior:
+            guardar_snapshot(GRAFO, RUTA_COMPARTIDA)
+            with open(os.path.join(RUTA_COMPARTIDA, 'actualizacion.pickle'), 'wb') as f:
+                pickle.dump((_ULTIMA_ACTUALIZACION, _FILAS_EN_MARCA), f)
+            _COMPARTIDO_VISTO = _marca_compartida()
+
+def inicializar():
+    with _BLOQUEO_RECARGA, _cambio_compartido():
+        # Un trabajador que arranca después (sin preload_app, o reiniciado)
+        # toma el grafo compartido, con los cambios que hayan hecho los demás
+        if RUTA_COMPARTIDA and GRAFO is not None:
+            return
+        if RUTA_SNAPSHOT:
+            cargar_snapshot()
+        else:
+            cargar_datos()
+
+def crear_app(cargar=True):
+    """Aplicación Flask con los endpoints de la API.
+
+    Con cargar=True carga el grafo si este proceso aún no lo tiene; importar
+    el módulo no carga nada. La recarga periódica arranca con la primera
+    petición de cada proceso, porque los hilos no sobreviven a un fork.
+    """
+    app = Flask(__name__)
+    app.json = ProveedorJSON(app)
+    app.register_blueprint(api)
+    if cargar and GRAFO is None:
+        inicializar()
+    return app
+
+@api.before_app_request
+def _arrancar_recarga():
+    iniciar_recarga_periodica()
+
+@api.before_app_request
+def _sincronizar_compartido():
+    """Adopta el grafo que otro trabajador haya cambiado. Si este proceso
+    está recargando o alguien escribe la instantánea, se atiende con el
+    grafo actual y se revisa en la siguiente petición."""
+    if not RUTA_COMPARTIDA or _marca_compartida() == _COMPARTIDO_VISTO:
+        return
+    if not _BLOQUEO_RECARGA.acquire(blocking=False):
+        return
+    try:
+        with _bloqueo_compartido(False, esperar=False) as tomado:
+            if tomado:
+                _adoptar_compartido()
+    except (OSError, ValueError) as e:
+        registro.warning("No se pudo abrir el grafo compartido: %s", e)
+    finally:
+        _BLOQUEO_RECARGA.release()
+
+def _km(distancia):
+    # Los pesos de una instantánea en disco son float32; se redondea para no
+    # arrastrar ese ruido (1e-7 relativo) a las respuestas
+    return round(float(distancia), 6)
+
+def _recarga_periodica():
+    while True:
+        time.sleep(INTERVALO_RECARGA)
+        try:
+            recargar_datos()
+        except Exception as e:
+            registro.warning("Error en la recarga periódica: %s", e)
+
+def iniciar_recarga_periodica():
+    """Arranca el hilo de recarga una vez por proceso"""
+    global _PID_RECARGA
+    if INTERVALO_RECARGA > 0 and _PID_RECARGA != os.getpid():
+        _PID_RECARGA = os.getpid()
+        threading.Thread(target=_recarga_periodica, name="recarga-grafo", daemon=True).start()
+
+MODOS_CAMINO = ('dijkstra', 'astar', 'bidireccional')
+
+def dijkstra(grafo, origen_idx, destino_idx, modo=None):
+    """Camino mínimo entre dos lugares.
+
+    Sin modo se consulta la tabla precalculada (o Dijkstra si no existe).
+    modo='dijkstra', 'astar' o 'bidireccional' fuerza la búsqueda indicada y
+    reporta cuántos nodos asentó. A* necesita coordenadas para todos los
+    lugares; si faltan, se resuelve con Dijkstra.
+    """
+    if modo is None and grafo.tabla_dist is not None:
+        distancia = grafo.tabla_dist[origen_idx][destino_idx]
+        camino = reconstruir_camino(grafo.tabla_pred[origen_idx], origen_idx, destino_idx)
+        modo, asentados = 'tabla', None
+    elif modo == 'bidireccional':
+        distancia, camino, asentados = dijkstra_bidireccional(
+            grafo.csr, grafo.csr_inverso, origen_idx, destino_idx)
+    else:
+        heuristica = grafo.heuristica(destino_idx) if modo == 'astar' else None
+        modo = 'astar' if heuristica is not None else 'dijkstra'
+        distancia, camino, asentados = camino_punto_a_punto(
+            *grafo.csr, origen_idx, destino_idx, heuristica=heuristica)
     
     return {
-        "distancia": dist[destino_idx],
-        "camino": camino if camino else None
+        "distancia": _km(distancia),
+        "camino": [grafo.lugares[u] for u in camino] if camino else None,
+        "modo": modo,
+        "nodos_asentados": asentados
     }
 
+def resolver_lote(grafo, pares, pool=None):
+    """Caminos mínimos para muchos pares (i, j) agrupados por origen.
+
+    Cada origen distinto hace una sola búsqueda (o lee su fila de la tabla).
+    Con pool (el de _pool_calculo, con este grafo) y suficientes orígenes las
+    búsquedas se reparten entre sus procesos.
+    Devuelve {(i, j): (distancia, camino en índices o None)}.
+    """
+    por_origen = defaultdict(set)
+    for i, j in pares:
+        por_origen[i].add(j)
+    
+    resultados = {}
+    if grafo.tabla_dist is not None:
+        for i, destinos in por_origen.items():
+            for j in destinos:
+                resultados[(i, j)] = (grafo.tabla_dist[i][j], reconstruir_camino(grafo.tabla_pred[i], i, j))
+        return resultados
+    
+    tareas = [(i, sorted(destinos)) for i, destinos in por_origen.items()]
+    if pool is not None and len(tareas) >= UMBRAL_LOTE_PARALELO:
+        por_tarea = list(pool.map(_caminos_en_trabajador, tareas, chunksize=8))
+    else:
+        por_tarea = [(i, caminos_desde(*grafo.csr, i, destinos)) for i, destinos in tareas]
+    
+    for i, caminos in por_tarea:
+        for j, resultado in caminos.items():
+            resultados[(i, j)] = resultado
+    return resultados
+
+class CalculoSaturado(Exception):
+    """No hubo turno para un cálculo pesado dentro de ESPERA_CALCULO"""
+
+# Grafo de los procesos del pool de cálculo (heredado al bifurcar, ver CONTEXTO_CALCULO)
+_GRAFO_TRABAJADOR = None
+
+def _iniciar_trabajador_calculo(grafo):
+    global _GRAFO_TRABAJADOR
+    _GRAFO_TRABAJADOR = grafo
+
+def _en_trabajador(funcion, *args):
+    return funcion(_GRAFO_TRABAJADOR, *args)
+
+def _caminos_en_trabajador(tarea):
+    origen, destinos = tarea
+    return origen, caminos_desde(*_GRAFO_TRABAJADOR.csr, origen, destinos)
+
+def _pool_calculo(grafo):
+    """Pool de procesos con esta versión del grafo; se recrea al publicarse otra.
+
+    Con PROCESOS_CALCULO = 0 solo lo crean los lotes con "paralelo" y tiene
+    un proceso por CPU.
+    """
+    global _POOL_CALCULO
+    clave = (os.getpid(), grafo.version, grafo.creado)
+    with _BLOQUEO_POOL_CALCULO:
+        if _POOL_CALCULO is None or _POOL_CALCULO[0] != clave:
+            if _POOL_CALCULO is not None and _POOL_CALCULO[0][0] == os.getpid():
+                # Las tareas ya enviadas al pool anterior terminan igual
+                _POOL_CALCULO[1].shutdown(wait=False)
+            _POOL_CALCULO = (clave, ProcessPoolExecutor(
+                PROCESOS_CALCULO or None, mp_context=CONTEXTO_CALCULO,
+                initializer=_iniciar_trabajador_calculo, initargs=(grafo,)))
+        return _POOL_CALCULO[1]
+
+def _descartar_pool_calculo():
+    global _POOL_CALCULO
+    registro.warning("El pool de cálculo se rompió; se recreará")
+    with _BLOQUEO_POOL_CALCULO:
+        _POOL_CALCULO = None
+
+@contextmanager
+def _turno_calculo():
+    """Uno de los LIMITE_CALCULOS turnos; CalculoSaturado si no llega a tiempo"""
+    if not _CALCULOS.acquire(timeout=ESPERA_CALCULO):
+        raise CalculoSaturado()
+    try:
+        with fase('compute'):
+            yield
+    finally:
+        _CALCULOS.release()
+
+def calcular_pesado(grafo, funcion, *args):
+    """Ejecuta funcion(grafo, *args) con un turno de LIMITE_CALCULOS.
+
+    Con PROCESOS_CALCULO > 0 corre en el pool de procesos (funcion debe ser
+    de nivel de módulo). Lanza CalculoSaturado si no hay turno a tiempo.
+    """
+    with _turno_calculo():
+        # Una petición que aún usa la instantánea anterior se resuelve aquí
+        # para no recrear el pool hacia atrás
+        if PROCESOS_CALCULO > 0 and grafo is GRAFO:
+            try:
+                return _pool_calculo(grafo).submit(_en_trabajador, funcion, *args).result()
+            except BrokenProcessPool:
+                _descartar_pool_calculo()
+        return funcion(grafo, *args)
+
+def resolver_lote_paralelo(grafo, pares):
+    """resolver_lote repartiendo los orígenes entre los procesos del pool de
+    cálculo (el mismo de calcular_pesado), con un solo turno"""
+    with _turno_calculo():
+        if grafo is GRAFO and grafo.tabla_dist is None:
+            try:
+                return resolver_lote(grafo, pares, _pool_calculo(grafo))
+            except BrokenProcessPool:
+                _descartar_pool_calculo()
+        return resolver_lote(grafo, pares)
+
+def _camino(grafo, i, j, modo):
+    """La consulta a la tabla es inmediata; las búsquedas pasan por calcular_pesado"""
+    if modo is None and grafo.tabla_dist is not None:
+        return dijkstra(grafo, i, j)
+    return calcular_pesado(grafo, dijkstra, i, j, modo)
+
+@api.errorhandler(CalculoSaturado)
+def _calculo_saturado(error):
+    respuesta = jsonify({
+        "success": False,
+        "error": "Servidor ocupado con otros cálculos; reintente en unos segundos"
+    })
+    respuesta.status_code = 503
+    respuesta.headers['Retry-After'] = str(math.ceil(ESPERA_CALCULO))
+    return respuesta
+
+# --------------------------------------------------
+# Métricas y perfilado
+# --------------------------------------------------
+
+@contextmanager
+def fase(nombre):
+    """Suma la duración del bloque a la fase indicada de la petición en curso.
+
+    Las fases anidadas se descuentan de la exterior, así que cada segundo se
+    cuenta una sola vez. Fuera de una petición (arranque, recarga periódica)
+    no hace nada.
+    """
+    if not has_request_context() or 'fases' not in g:
+        yield
+        return
+    pila = g.pila_fases
+    pila.append(0.0)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        transcurrido = time.perf_counter() - inicio
+        anidado = pila.pop()
+        g.fases[nombre] = g.fases.get(nombre, 0.0) + transcurrido - anidado
+        if pila:
+            pila[-1] += transcurrido
+
+def _en_fase(nombre, funcion):
+    with fase(nombre):
+        return funcion()
+
+def jsonify(*args, **kwargs):
+    """jsonify de Flask, medido como fase serialize"""
+    with fase('serialize'):
+        return _jsonify_flask(*args, **kwargs)
+
+def _consultar(clave, calcular):
+    """Consulta la caché (fase lookup) y, si no está, calcula (fase compute)"""
+    with fase('lookup'):
+        return CACHE_CONSULTAS.obtener(clave, lambda: _en_fase('compute', calcular))
+
+def _perfil_pedido():
+    if request.args.get('perfil', '0').lower() not in ('1', 'true', 'si') and \
+            request.headers.get('X-Perfil', '0').lower() not in ('1', 'true', 'si'):
+        return False
+    return not TOKEN_ADMIN or request.headers.get('X-Admin-Token') == TOKEN_ADMIN
+
+@api.before_app_request
+def _iniciar_medicion():
+    g.inicio = time.perf_counter()
+    g.fases = {}
+    g.pila_fases = []
+    g.perfil = None
+    pedido = _perfil_pedido()
+    if (pedido or random.random() < TASA_MUESTREO_PERFIL) and _BLOQUEO_PERFIL.acquire(blocking=False):
+        g.perfil = cProfile.Profile()
+        g.perfil_pedido = pedido
+        g.perfil.enable()
+
+@api.after_app_request
+def _terminar_medicion(respuesta):
+    if 'inicio' not in g:
+        return respuesta
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+    metodo, url = request.method, request.full_path
+    inicio, fases, perfil = g.inicio, g.fases, g.perfil
+    pedido = perfil is not None and g.perfil_pedido
+    # Las respuestas por tramos se generan después de este punto: el tiempo de
+    # envío que no midan otras fases se cuenta como serialize
+    envio = time.perf_counter()
+    medido_antes = sum(fases.values())
+    if perfil is not None:
+        # El perfil se cierra al terminar el envío; el nombre se reserva ya
+        # para devolverlo en la cabecera
+        g.perfil = None
+        nombre_perfil = PERFILES.nuevo_nombre()
+        if pedido:
+            respuesta.headers['X-Perfil'] = nombre_perfil
+
+    def registrar():
+        fin = time.perf_counter()
+        if perfil is not None:
+            perfil.disable()
+            _BLOQUEO_PERFIL.release()
+            if pedido or fin - inicio >= UMBRAL_PERFIL_LENTO:
+                motivo = 'pedido' if pedido else 'muestreo'
+                PERFILES.guardar(perfil, nombre_perfil, endpoint=endpoint, metodo=metodo, motivo=motivo,
+                                 url=url, duracion=round(fin - inicio, 6))
+                METRICAS.incrementar('api_perfiles_total', motivo=motivo)
+        if respuesta.is_streamed:
+            fases['serialize'] = fases.get('serialize', 0.0) + \
+                (fin - envio) - (sum(fases.values()) - medido_antes)
+        METRICAS.incrementar('api_peticiones_total', endpoint=endpoint, metodo=metodo,
+                             estado=str(respuesta.status_code))
+        METRICAS.observar('api_latencia_segundos', fin - inicio, endpoint=endpoint)
+        for nombre, segundos in fases.items():
+            METRICAS.observar('api_fase_segundos', segundos, endpoint=endpoint, fase=nombre)
+
+    respuesta.call_on_close(registrar)
+    return respuesta
+
+@api.teardown_app_request
+def _liberar_perfil(error=None):
+    # Si la petición falló antes de after_request, el perfil queda sin dueño
+    perfil = g.pop('perfil', None)
+    if perfil is not None:
+        perfil.disable()
+        _BLOQUEO_PERFIL.release()
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    grafo = GRAFO
+    METRICAS.fijar('grafo_version', grafo.version)
+    METRICAS.fijar('grafo_lugares', len(grafo))
+    METRICAS.fijar('grafo_aristas', grafo.n_aristas)
+    METRICAS.fijar('grafo_componentes', grafo.n_componentes)
+    cache = CACHE_CONSULTAS.estadisticas()
+    METRICAS.fijar('cache_entradas', cache['entradas'])
+    METRICAS.fijar('cache_aciertos_total', cache['aciertos'])
+    METRICAS.fijar('cache_fallos_total', cache['fallos'])
+    return Response(METRICAS.texto(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/perfiles', methods=['GET'])
+def listar_perfiles():
+    """Perfiles guardados, del más reciente al más antiguo"""
+    if TOKEN_ADMIN and request.headers.get('X-Admin-Token') != TOKEN_ADMIN:
+        return jsonify({
+            "success": False,
+            "error": "No autorizado"
+        }), 403
+    perfiles = PERFILES.listar()
+    return jsonify({
+        "success": True,
+        "count": len(perfiles),
+        "perfiles": perfiles
+    })
+
+@api.route('/api/perfiles/<nombre>', methods=['GET'])
+def ver_perfil(nombre):
+    """Resumen pstats (ordenado por tiempo acumulado) de un perfil guardado"""
+    if TOKEN_ADMIN and request.headers.get('X-Admin-Token') != TOKEN_ADMIN:
+        return jsonify({
+            "success": False,
+            "error": "No autorizado"
+        }), 403
+    perfil = PERFILES.obtener(nombre)
+    if perfil is None:
+        return jsonify({
+            "success": False,
+            "error": "Perfil no encontrado"
+        }), 404
+    return Response(perfil["texto"], mimetype='text/plain')
+
+@api.after_app_request
+def _comprimir_respuesta(respuesta):
+    """gzip/br según Accept-Encoding; las respuestas por tramos se comprimen al vuelo"""
+    if respuesta.status_code in (204, 206, 304) or respuesta.status_code < 200 or \
+            'Content-Encoding' in respuesta.headers or respuesta.direct_passthrough or \
+            respuesta.mimetype not in TIPOS_COMPRIMIBLES:
+        return respuesta
+    respuesta.vary.add('Accept-Encoding')
+    metodo = elegir_compresion(request.accept_encodings)
+    if metodo is None:
+        return respuesta
+    
+    if respuesta.is_streamed:
+        respuesta.response = comprimir_flujo(respuesta.response, metodo)
+    else:
+        datos = respuesta.get_data()
+        if len(datos) < MIN_BYTES_COMPRESION:
+            return respuesta
+        with fase('serialize'):
+            respuesta.set_data(comprimir(datos, metodo))
+    respuesta.headers['Content-Encoding'] = metodo
+    _debilitar_etag(respuesta)
+    return respuesta
+
+def _debilitar_etag(respuesta):
+    # El cuerpo comprimido es otra representación: su ETag pasa a ser débil
+    etag, debil = respuesta.get_etag()
+    if etag and not debil:
+        respuesta.set_etag(etag, weak=True)
+
+def _respuesta_estatica(grafo, etag, clave, construir):
+    """Respuesta JSON que solo depende de la versión del grafo.
+
+    El cuerpo se serializa una vez por versión (y se comprime una vez por
+    método) y las peticiones siguientes lo sirven desde CACHE_SERIALIZADA.
+    """
+    version = (grafo.version, grafo.creado)
+    with fase('serialize'):
+        cuerpo = CACHE_SERIALIZADA.obtener((clave, version), lambda: a_json(construir(), ordenar=True))
+        metodo = elegir_compresion(request.accept_encodings) \
+            if len(cuerpo) >= MIN_BYTES_COMPRESION else None
+        if metodo is not None:
+            sin_comprimir = cuerpo
+            cuerpo = CACHE_SERIALIZADA.obtener((clave, version, metodo),
+                                               lambda: comprimir(sin_comprimir, metodo))
+    
+    respuesta = _marcar_version(Response(cuerpo, mimetype='application/json'), grafo, etag)
+    respuesta.vary.add('Accept-Encoding')
+    if metodo is not None:
+        respuesta.headers['Content-Encoding'] = metodo
+        _debilitar_etag(respuesta)
+    return respuesta
+
 # --------------------------------------------------
 # ENDPOINTS
 # --------------------------------------------------
 
-@app.route('/')
+@api.route('/')
 def home():
     return "API de Rutas Quetzaltenango - USAC está en funcionamiento"
 
-@app.route('/api/lugares', methods=['GET'])
+@api.route('/api/lugares', methods=['GET'])
 def get_lugares():
-    return jsonify({
+    grafo = GRAFO
+    etag = _etag(grafo)
+    no_modificado = _respuesta_no_modificada(grafo, etag)
+    if no_modificado is not None:
+        return no_modificado
+    
+    return _respuesta_estatica(grafo, etag, 'lugares', lambda: {
         "success": True,
-        "count": len(LUGARES),
-        "lugares": LUGARES
+        "count": len(grafo.lugares),
+        "lugares": grafo.lugares
     })
 
-@app.route('/api/conectividad', methods=['GET'])
+@api.route('/api/conectividad', methods=['GET'])
 def verificar_conectividad():
     origen = request.args.get('origen')
     destino = request.args.get('destino')
@@ -115,29 +863,54 @@ def verificar_conectividad():
             "error": "Se requieren los parámetros 'origen' y 'destino'"
         }), 400
     
+    grafo = GRAFO
     try:
-        i = LUGARES.index(origen)
-        j = LUGARES.index(destino)
-        matriz_conectividad = warshall(MATRIZ_ADY)
+        with fase('lookup'):
+            i = grafo.indice[origen]
+            j = grafo.indice[destino]
+        conectado, directa = _consultar(
+            ("conectividad", origen, destino, grafo.version, grafo.creado),
+            lambda: (grafo.conectado(i, j), grafo.arista_directa(i, j))
+        )
         
         return jsonify({
             "success": True,
-            "conectado": bool(matriz_conectividad[i][j]),
+            "conectado": conectado,
             "origen": origen,
             "destino": destino,
-            "conexion_directa": bool(MATRIZ_ADY[i][j])
+            "conexion_directa": directa,
+            "componente_origen": grafo.componente(i),
+            "componente_destino": grafo.componente(j)
         })
         
-    except ValueError:
+    except KeyError:
         return jsonify({
             "success": False,
             "error": "Lugar no encontrado en la base de datos"
         }), 404
 
-@app.route('/api/camino-minimo', methods=['GET'])
+@api.route('/api/componentes', methods=['GET'])
+def get_componentes():
+    """Componente fuertemente conexa de cada lugar: dos lugares con el mismo
+    identificador se alcanzan mutuamente"""
+    grafo = GRAFO
+    etag = _etag(grafo)
+    no_modificado = _respuesta_no_modificada(grafo, etag)
+    if no_modificado is not None:
+        return no_modificado
+
+    return _respuesta_estatica(grafo, etag, 'componentes', lambda: {
+        "success": True,
+        "count": grafo.n_componentes,
+        "componentes": dict(zip(grafo.lugares, grafo.componentes.tolist()))
+    })
+
+@api.route('/api/camino-minimo', methods=['GET'])
 def encontrar_camino_minimo():
+    """?modo=dijkstra|astar|bidireccional fuerza una búsqueda y reporta los nodos asentados"""
     origen = request.args.get('origen')
     destino = request.args.get('destino')
+    modo = request.args.get('modo') or None
     
     if not origen or not destino:
         return jsonify({
@@ -145,10 +918,21 @@ def encontrar_camino_minimo():
             "error": "Se requieren los parámetros 'origen' y 'destino'"
         }), 400
     
+    if modo is not None and modo not in MODOS_CAMINO:
+        return jsonify({
+            "success": False,
+            "error": f"Modo no soportado (use {', '.join(MODOS_CAMINO)})"
+        }), 400
+    
+    grafo = GRAFO
     try:
-        i = LUGARES.index(origen)
-        j = LUGARES.index(destino)
-        resultado = dijkstra(i, j)
+        with fase('lookup'):
+            i = grafo.indice[origen]
+            j = grafo.indice[destino]
+        resultado = _consultar(
+            ("camino-minimo", origen, destino, modo, grafo.version, grafo.creado),
+            lambda: _camino(grafo, i, j, modo)
+        )
         
         if not resultado["camino"]:
             return jsonify({
@@ -161,48 +945,470 @@ def encontrar_camino_minimo():
             "origen": origen,
             "destino": destino,
             "distancia": resultado["distancia"],
-            "camino": resultado["camino"]
+            "camino": resultado["camino"],
+            "modo": resultado["modo"],
+            "nodos_asentados": resultado["nodos_asentados"]
         })
         
-    except ValueError:
+    except KeyError:
+        return jsonify({
+            "success": False,
+            "error": "Lugar no encontrado en la base de datos"
+        }), 404
+
+@api.route('/api/rutas-lote', methods=['POST'])
+def rutas_lote():
+    """Varios caminos mínimos en una sola petición.
+
+    Acepta {"pares": [[origen, destino], ...]} o, para una matriz
+    uno-a-muchos / muchos-a-muchos, {"origenes": [...], "destinos": [...]}.
+    Con "paralelo": true los lotes grandes se reparten entre los procesos del
+    pool de cálculo (ver _pool_calculo).
+    """
+    datos = request.get_json(silent=True) or {}
+    if not isinstance(datos, dict):
+        datos = {}
+    
+    if "pares" in datos:
+        if not _lista_de(datos["pares"], lambda par: _lista_de(par, _es_lugar) and len(par) == 2):
+            return jsonify({
+                "success": False,
+                "error": "'pares' debe ser una lista de pares [origen, destino]"
+            }), 400
+        total = len(datos["pares"])
+        matriz = False
+    elif "origenes" in datos and "destinos" in datos:
+        if not (_lista_de(datos["origenes"], _es_lugar) and _lista_de(datos["destinos"], _es_lugar)):
+            return jsonify({
+                "success": False,
+                "error": "'origenes' y 'destinos' deben ser listas de lugares"
+            }), 400
+        total = len(datos["origenes"]) * len(datos["destinos"])
+        matriz = True
+    else:
+        return jsonify({
+            "success": False,
+            "error": "Se requiere 'pares' o bien 'origenes' y 'destinos'"
+        }), 400
+    
+    # Se comprueba antes de armar el producto cruzado, que podría no caber en memoria
+    if total > MAX_PARES_LOTE:
+        return jsonify({
+            "success": False,
+            "error": f"El lote excede el máximo de {MAX_PARES_LOTE} pares"
+        }), 400
+    if matriz:
+        pares = [(o, d) for o in datos["origenes"] for d in datos["destinos"]]
+    else:
+        pares = [tuple(par) for par in datos["pares"]]
+    
+    grafo = GRAFO
+    try:
+        with fase('lookup'):
+            pares_idx = [(grafo.indice[o], grafo.indice[d]) for o, d in pares]
+    except KeyError:
         return jsonify({
             "success": False,
             "error": "Lugar no encontrado en la base de datos"
         }), 404
+    
+    if grafo.tabla_dist is not None:
+        # Con la tabla cada par es una lectura: ni turno ni viaje al pool
+        resultados = resolver_lote(grafo, pares_idx)
+    elif datos.get("paralelo"):
+        resultados = resolver_lote_paralelo(grafo, pares_idx)
+    else:
+        resultados = calcular_pesado(grafo, resolver_lote, pares_idx)
+    
+    rutas = []
+    with fase('serialize'):
+        for (origen, destino), par in zip(pares, pares_idx):
+            distancia, camino = resultados[par]
+            rutas.append({
+                "origen": origen,
+                "destino": destino,
+                "distancia": None if math.isinf(distancia) else _km(distancia),
+                "camino": [grafo.lugares[u] for u in camino] if camino else None
+            })
+    
+    respuesta = {
+        "success": True,
+        "count": len(rutas),
+        "rutas": rutas
+    }
+    if matriz:
+        columnas = len(datos["destinos"])
+        respuesta["matriz_distancias"] = [
+            [ruta["distancia"] for ruta in rutas[k:k + columnas]]
+            for k in range(0, len(rutas), columnas)
+        ] if columnas else [[] for _ in datos["origenes"]]
+    return jsonify(respuesta)
+
+def _es_lugar(valor):
+    return isinstance(valor, str)
+
+def _lista_de(valor, valido):
+    return isinstance(valor, list) and all(valido(elemento) for elemento in valor)
 
-@app.route('/api/matrices', methods=['GET'])
+def _etag(grafo, variante=b''):
+    # Cambia con cada versión del grafo y con cada representación pedida
+    return f"g{grafo.version}-{int(grafo.creado)}-{zlib.crc32(variante):08x}"
+
+def _respuesta_no_modificada(grafo, etag):
+    """Respuesta 304 si el cliente ya tiene esta versión (If-None-Match / If-Modified-Since)"""
+    if request.if_none_match:
+        # Débil: la versión comprimida de la misma representación también vale
+        vigente = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since is not None:
+        vigente = int(grafo.creado) <= request.if_modified_since.timestamp()
+    else:
+        vigente = False
+    if vigente:
+        return _marcar_version(Response(status=304), grafo, etag)
+    return None
+
+def _marcar_version(respuesta, grafo, etag):
+    respuesta.set_etag(etag)
+    respuesta.last_modified = datetime.fromtimestamp(int(grafo.creado), timezone.utc)
+    return respuesta
+
+def _parametro_entero(nombre, defecto):
+    """Entero no negativo de la query string; ValueError si no es válido"""
+    valor = request.args.get(nombre)
+    if valor is None or valor == '':
+        return defecto
+    valor = int(valor)
+    if valor < 0:
+        raise ValueError(nombre)
+    return valor
+
+def _json_filas(filas):
+    """Serializa un iterable de filas como arreglo JSON, una fila por trozo"""
+    separador = b''
+    yield b'['
+    for fila in filas:
+        yield separador + a_json(fila)
+        separador = b','
+    yield b']'
+
+def _filas_matriz(grafo, inicio, fin, cual, codificacion):
+    """Arreglo JSON con las filas de una matriz, serializadas por bloques
+    directamente desde NumPy (las 0/1 en la codificación pedida)"""
+    separador = b''
+    yield b'['
+    for desde in range(inicio, fin, BLOQUE_FILAS):
+        with fase('compute'):
+            bloque = grafo.bloque_denso(desde, min(fin, desde + BLOQUE_FILAS))[cual]
+        if cual != 1:
+            bloque = codificar_filas(bloque, codificacion)
+        # Sin los corchetes exteriores del bloque para encadenarlo con los demás
+        trozo = a_json(bloque)[1:-1]
+        if trozo:
+            yield separador + trozo
+            separador = b','
+    yield b']'
+
+@api.route('/api/matrices', methods=['GET'])
 def get_matrices():
+    """Matrices del grafo.
+
+    formato: json (por defecto, enviado por tramos), ndjson (una línea por
+    lugar), aristas (lista compacta [i, j, distancia] de las adyacencias) o
+    npz (la misma lista en binario NumPy). fila_inicio y filas limitan el
+    rango de filas de las matrices. codificacion=bits envía cada fila de
+    adyacencia y conectividad como cadena "0110..." y codificacion=rle como
+    rachas [valor inicial, largo, largo, ...]; por defecto, listas de 0/1.
+    """
+    grafo = GRAFO
+    formato = request.args.get('formato', 'json')
+    codificacion = request.args.get('codificacion', 'lista')
+    etag = _etag(grafo, request.query_string)
+    no_modificado = _respuesta_no_modificada(grafo, etag)
+    if no_modificado is not None:
+        return no_modificado
+    
+    if formato == 'aristas':
+        def construir():
+            origenes, destinos, distancias = grafo.aristas_adyacentes()
+            return {
+                "success": True,
+                "version": grafo.version,
+                "lugares": grafo.lugares,
+                "count": len(origenes),
+                "aristas": [
+                    [i, j, d] for i, j, d in zip(origenes.tolist(), destinos.tolist(),
+                                                 distancias.astype(float).round(6).tolist())
+                ]
+            }
+        return _respuesta_estatica(grafo, etag, 'aristas', construir)
+    
+    if formato == 'npz':
+        origenes, destinos, distancias = grafo.aristas_adyacentes()
+        buf = BytesIO()
+        with fase('serialize'):
+            np.savez(buf, lugares=np.array(grafo.lugares), origenes=origenes.astype(np.int32),
+                     destinos=destinos.astype(np.int32), distancias=distancias.astype(np.float32))
+        return _marcar_version(
+            Response(buf.getvalue(), mimetype='application/octet-stream',
+                     headers={'Content-Disposition': 'attachment; filename=grafo.npz'}),
+            grafo, etag)
+    
+    if formato not in ('json', 'ndjson'):
+        return jsonify({
+            "success": False,
+            "error": "Formato no soportado (json, ndjson, aristas o npz)"
+        }), 400
+    
+    if codificacion not in CODIFICACIONES:
+        return jsonify({
+            "success": False,
+            "error": f"Codificación no soportada (use {', '.join(CODIFICACIONES)})"
+        }), 400
+    
+    if len(grafo) > LIMITE_MATRICES_DENSAS:
+        return jsonify({
+            "success": False,
+            "error": f"El grafo tiene {len(grafo)} lugares; las matrices densas solo "
+                     f"se generan hasta {LIMITE_MATRICES_DENSAS}. Use formato=aristas"
+        }), 413
+    
+    try:
+        inicio = min(_parametro_entero('fila_inicio', 0), len(grafo))
+        fin = min(len(grafo), inicio + _parametro_entero('filas', len(grafo)))
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "error": "'fila_inicio' y 'filas' deben ser enteros no negativos"
+        }), 400
+    
+    if formato == 'ndjson':
+        def generar():
+            for desde in range(inicio, fin, BLOQUE_FILAS):
+                hasta = min(fin, desde + BLOQUE_FILAS)
+                with fase('compute'):
+                    ady, dist, conex = grafo.bloque_denso(desde, hasta)
+                ady = codificar_filas(ady, codificacion)
+                conex = codificar_filas(conex, codificacion)
+                for k, i in enumerate(range(desde, hasta)):
+                    yield a_json({
+                        "fila": i,
+                        "lugar": grafo.lugares[i],
+                        "adyacencia": ady[k],
+                        "distancias": dist[k],
+                        "conectividad": conex[k]
+                    }) + b'\n'
+        return _marcar_version(
+            Response(stream_with_context(generar()), mimetype='application/x-ndjson'), grafo, etag)
+    
+    def generar():
+        yield '{"success": true, "version": %d, "fila_inicio": %d, "filas": %d, "lugares": ' % (
+            grafo.version, inicio, fin - inicio)
+        yield a_json(grafo.lugares)
+        yield ', "codificacion": "%s"' % codificacion
+        for clave, cual in (("matriz_adyacencia", 0), ("matriz_distancias", 1), ("matriz_conectividad", 2)):
+            yield ', "%s": ' % clave
+            yield from _filas_matriz(grafo, inicio, fin, cual, codificacion)
+        yield '}'
+    return _marcar_version(
+        Response(stream_with_context(generar()), mimetype='application/json'), grafo, etag)
+
+@api.route('/api/conexiones', methods=['GET'])
+def get_conexiones():
+    """Conexiones servidas desde el grafo en memoria.
+
+    offset y limit paginan la tabla; solo_adyacentes=1 omite las filas sin
+    adyacencia. formato=ndjson envía una conexión por línea; con json (por
+    defecto) el documento también se genera por tramos.
+    """
+    grafo = GRAFO
+    formato = request.args.get('formato', 'json')
+    solo_adyacentes = request.args.get('solo_adyacentes', '0').lower() in ('1', 'true', 'si')
+    total = grafo.contar_filas(solo_adyacentes)
+    
+    try:
+        inicio = min(_parametro_entero('offset', 0), total)
+        fin = min(total, inicio + _parametro_entero('limit', total))
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "error": "'offset' y 'limit' deben ser enteros no negativos"
+        }), 400
+    
+    filas = grafo.filas(inicio, fin, solo_adyacentes=solo_adyacentes)
+    
+    if formato == 'ndjson':
+        def generar():
+            for fila in filas:
+                yield a_json(fila) + b'\n'
+        # X-Version-Grafo permite a un cliente que pagina comprobar que el
+        # grafo no cambió entre páginas (los offsets dependen de la versión)
+        return Response(stream_with_context(generar()), mimetype='application/x-ndjson',
+                        headers={'X-Total-Count': str(total),
+                                 'X-Version-Grafo': f"g{grafo.version}-{int(grafo.creado)}"})
+    
+    if formato != 'json':
+        return jsonify({
+            "success": False,
+            "error": "Formato no soportado (json o ndjson)"
+        }), 400
+    
+    def generar():
+        yield '{"success": true, "count": %d, "total": %d, "offset": %d, "version": %d, ' % (
+            fin - inicio, total, inicio, grafo.version)
+        yield '"siguiente": %s, "data": ' % (fin if fin < total else 'null')
+        yield from _json_filas(filas)
+        yield '}'
+    return Response(stream_with_context(generar()), mimetype='application/json')
+
+@api.route('/api/cache', methods=['GET'])
+def get_cache():
+    """Contadores de aciertos/fallos de la caché de consultas"""
     return jsonify({
         "success": True,
-        "lugares": LUGARES,
-        "matriz_adyacencia": MATRIZ_ADY.tolist(),
-        "matriz_distancias": MATRIZ_DIST.tolist(),
-        "matriz_conectividad": warshall(MATRIZ_ADY).tolist()
+        "version": GRAFO.version,
+        "cache": CACHE_CONSULTAS.estadisticas()
     })
 
-@app.route('/api/conexiones', methods=['GET'])
-def get_conexiones():
-    """Nuevo endpoint para extraer conexiones"""
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
+def aplicar_cambios_aristas(cambios, persistir=False):
+    """Aplica cambios de aristas al grafo en memoria (y opcionalmente a MySQL).
+
+    cambios es una lista de tuplas (origen, destino, distancia_km, adyacente).
+    La tabla de caminos se actualiza de forma incremental y la nueva
+    instantánea se publica de una sola vez y, con RUTA_COMPARTIDA, llega
+    también a los demás trabajadores.
+    """
+    with _BLOQUEO_RECARGA, _cambio_compartido():
+        if persistir:
+            with fase('db'):
+                conn = obtener_conexion()
+                cursor = conn.cursor()
+                try:
+                    for origen, destino, distancia, adyacente in cambios:
+                        cursor.execute(
+                            "UPDATE distancias_adyacencia SET distancia_km = %s, adyacente = %s "
+                            "WHERE origen = %s AND destino = %s",
+                            (distancia, adyacente, origen, destino)
+                        )
+                        if cursor.rowcount == 0:
+                            cursor.execute(
+                                "INSERT INTO distancias_adyacencia (origen, destino, distancia_km, adyacente) "
+                                "VALUES (%s, %s, %s, %s)",
+                                (origen, destino, distancia, adyacente)
+                            )
+                    conn.commit()
+                finally:
+                    cursor.close()
+                    conn.close()
+        return _publicar(_en_fase('compute', lambda: GRAFO.con_cambios(cambios)))
+
+@api.route('/api/aristas', methods=['POST'])
+def actualizar_aristas():
+    """Agrega, elimina o cambia el peso de aristas sin recargar todo el grafo.
+
+    Cuerpo: {"cambios": [{"origen", "destino", "distancia_km", "adyacente"}, ...],
+    "persistir": false}. Sin distancia_km se conserva la actual; sin
+    adyacente se asume 1; "eliminar": true marca la arista como no adyacente.
+    """
+    if TOKEN_ADMIN and request.headers.get('X-Admin-Token') != TOKEN_ADMIN:
+        return jsonify({
+            "success": False,
+            "error": "No autorizado"
+        }), 403
     
-    cursor.execute("SELECT origen, destino, distancia_km, adyacente FROM distancias_adyacencia")
-    data = cursor.fetchall()
+    datos = request.get_json(silent=True) or {}
+    if not isinstance(datos, dict):
+        datos = {}
+    if not _lista_de(datos.get("cambios"), lambda c: isinstance(c, dict) and c.get("origen") and
+                     c.get("destino") and _es_lugar(c["origen"]) and _es_lugar(c["destino"])):
+        return jsonify({
+            "success": False,
+            "error": "Se requiere 'cambios' con 'origen' y 'destino' en cada elemento"
+        }), 400
     
-    cursor.close()
-    conn.close()
+    grafo = GRAFO
+    cambios = []
+    try:
+        for cambio in datos["cambios"]:
+            origen, destino = cambio["origen"], cambio["destino"]
+            i, j = grafo.indice[origen], grafo.indice[destino]
+            distancia = cambio.get("distancia_km")
+            distancia = grafo.distancia_registrada(i, j) if distancia is None else float(distancia)
+            adyacente = 0 if cambio.get("eliminar") else int(cambio.get("adyacente", 1))
+            if distancia < 0 or not math.isfinite(distancia):
+                raise ValueError(distancia)
+            cambios.append((origen, destino, distancia, adyacente))
+    except KeyError:
+        return jsonify({
+            "success": False,
+            "error": "Lugar no encontrado en la base de datos"
+        }), 404
+    except (TypeError, ValueError):
+        return jsonify({
+            "success": False,
+            "error": "'distancia_km' debe ser un número no negativo y 'adyacente' un entero"
+        }), 400
+    
+    try:
+        nuevo = aplicar_cambios_aristas(cambios, persistir=bool(datos.get("persistir")))
+    except ERRORES_BD as e:
+        return jsonify({
+            "success": False,
+            "error": f"Error de base de datos: {e}"
+        }), 503
+    
+    return jsonify({
+        "success": True,
+        "version": nuevo.version,
+        "aristas_aplicadas": len(cambios)
+    })
+
+@api.route('/api/admin/recargar', methods=['POST'])
+def admin_recargar():
+    """Recarga el grafo desde la base de datos (?completa=1 fuerza lectura total)"""
+    if TOKEN_ADMIN and request.headers.get('X-Admin-Token') != TOKEN_ADMIN:
+        return jsonify({
+            "success": False,
+            "error": "No autorizado"
+        }), 403
+    
+    completa = request.args.get('completa', '0').lower() in ('1', 'true', 'si')
+    try:
+        grafo, aplicadas = recargar_datos(completa=completa)
+    except ERRORES_BD as e:
+        return jsonify({
+            "success": False,
+            "error": f"Error de base de datos: {e}"
+        }), 503
+    except (OSError, ValueError) as e:
+        return jsonify({
+            "success": False,
+            "error": f"Error al abrir la instantánea: {e}"
+        }), 503
     
     return jsonify({
         "success": True,
-        "count": len(data),
-        "data": data
+        "version": grafo.version,
+        "lugares": len(grafo),
+        "aristas": grafo.n_aristas,
+        "aristas_aplicadas": aplicadas
     })
 
 # --------------------------------------------------
 # Inicialización
 # --------------------------------------------------
 
-cargar_datos()
+if __name__ == '__main__' and len(sys.argv) > 1 and sys.argv[1] == 'exportar-snapshot':
+    # python API.py exportar-snapshot <directorio> [--sin-tablas]
+    # Construye la instantánea binaria a partir de MySQL
+    if len(sys.argv) < 3:
+        sys.exit("Uso: python API.py exportar-snapshot <directorio> [--sin-tablas]")
+    manifiesto = guardar_snapshot(cargar_datos(), sys.argv[2],
+                                  incluir_tablas='--sin-tablas' not in sys.argv[3:])
+    print(f"Instantánea v{manifiesto['version']} guardada en {sys.argv[2]}: "
+          f"{manifiesto['lugares']} lugares, {manifiesto['aristas']} aristas")
+    sys.exit(0)
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    # Servidor de desarrollo; en producción: gunicorn -c gunicorn.conf.py wsgi:app
+    crear_app().run(debug=os.environ.get('API_DEBUG') == '1', threaded=True,
+                    port=5000, host='0.0.0.0')
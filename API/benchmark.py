@@ -0,0 +1,273 @@
+"""Benchmark de la API sobre grafos sintéticos tipo red vial.
+
+Genera grillas de calles (con algunos tramos de un solo sentido y otros
+cortados) de varios tamaños, las guarda en una base SQLite con el mismo
+esquema que MySQL y mide la carga, el índice de alcanzabilidad, los caminos
+mínimos individuales y por lotes y cada endpoint a través del cliente de
+pruebas de Flask. El resultado es JSON para comparar entre versiones:
+
+    python benchmark.py --tamanos 100,1000,10000 --salida resultados.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Cortes y sentidos únicos de la grilla sintética
+PROB_CORTE = 0.05
+PROB_UN_SENTIDO = 0.10
+
+def warshall(matriz):
+    """Cierre transitivo denso con Warshall sobre filas empaquetadas en bits.
+
+    Es el cálculo que hacía la API antes del índice por componentes fuertes;
+    solo queda como referencia de tiempos en grafos pequeños.
+    """
+    n = len(matriz)
+    bits = np.packbits(np.asarray(matriz) != 0, axis=1)
+    # Para cada pivote k, toda fila que alcanza a k hereda (OR) la fila k
+    for k in range(n):
+        byte, desplazamiento = divmod(k, 8)
+        filas = ((bits[:, byte] >> (7 - desplazamiento)) & 1).astype(bool)
+        if filas.any():
+            bits[filas] |= bits[k]
+    return np.unpackbits(bits, axis=1, count=n).astype(np.asarray(matriz).dtype)
+
+def generar_grilla(n, semilla=0):
+    """Grilla de unos n lugares con calles entre vecinos.
+
+    Devuelve (lugares, filas, coordenadas) con filas en el formato de
+    distancias_adyacencia: (origen, destino, distancia_km, adyacente). Como en
+    la tabla original, cada lugar tiene su fila consigo mismo (0 km, no
+    adyacente), así que ninguno queda fuera por no tener salidas.
+    """
+    rng = random.Random(semilla)
+    lado = max(2, math.ceil(math.sqrt(n)))
+    nombre = lambda f, c: f"N{f:04d}_{c:04d}"
+    # Cuadras de unos 100 m con algo de ruido en la posición
+    coordenadas = {
+        nombre(f, c): (c * 0.1 + rng.uniform(-0.02, 0.02), f * 0.1 + rng.uniform(-0.02, 0.02))
+        for f in range(lado) for c in range(lado)
+    }
+    lugares = sorted(coordenadas)[:n]
+    presentes = set(lugares)
+
+    filas = [(lugar, lugar, 0.0, 0) for lugar in lugares]
+    for f in range(lado):
+        for c in range(lado):
+            a = nombre(f, c)
+            for b in (nombre(f, c + 1), nombre(f + 1, c)):
+                if a not in presentes or b not in presentes or rng.random() < PROB_CORTE:
+                    continue
+                (xa, ya), (xb, yb) = coordenadas[a], coordenadas[b]
+                # Las calles no son rectas: algo más largas que la distancia euclídea
+                km = round(math.hypot(xa - xb, ya - yb) * rng.uniform(1.0, 1.3), 4)
+                sentidos = [(a, b), (b, a)]
+                if rng.random() < PROB_UN_SENTIDO:
+                    sentidos = [rng.choice(sentidos)]
+                filas.extend((o, d, km, 1) for o, d in sentidos)
+    return lugares, filas, {lugar: coordenadas[lugar] for lugar in lugares}
+
+def crear_base(ruta, filas, coordenadas):
+    """Base SQLite con distancias_adyacencia y coordenadas_lugares"""
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    conn = sqlite3.connect(ruta)
+    conn.execute("CREATE TABLE distancias_adyacencia ("
+                 "origen TEXT, destino TEXT, distancia_km REAL, adyacente INTEGER)")
+    conn.execute("CREATE TABLE coordenadas_lugares (lugar TEXT, x REAL, y REAL)")
+    conn.executemany("INSERT INTO distancias_adyacencia VALUES (?, ?, ?, ?)", filas)
+    conn.executemany("INSERT INTO coordenadas_lugares VALUES (?, ?, ?)",
+                     [(lugar, x, y) for lugar, (x, y) in coordenadas.items()])
+    conn.commit()
+    conn.close()
+
+def _cronometrar(funcion, repeticiones):
+    """Ejecuta funcion() varias veces; devuelve (estadísticas en ms, último resultado)"""
+    muestras = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        muestras.append((time.perf_counter() - inicio) * 1000)
+    return _estadisticas(muestras), resultado
+
+def _duracion(funcion):
+    inicio = time.perf_counter()
+    funcion()
+    return (time.perf_counter() - inicio) * 1000
+
+def _estadisticas(muestras):
+    muestras = np.asarray(muestras, dtype=float)
+    return {
+        "n": len(muestras),
+        "media_ms": round(float(muestras.mean()), 3),
+        "p50_ms": round(float(np.percentile(muestras, 50)), 3),
+        "p95_ms": round(float(np.percentile(muestras, 95)), 3),
+        "min_ms": round(float(muestras.min()), 3),
+    }
+
+def medir_tamano(API, n, directorio, repeticiones, consultas, semilla):
+    from grafo import floyd_warshall, indice_alcance
+
+    lugares, filas, coordenadas = generar_grilla(n, semilla)
+    ruta = os.path.join(directorio, f"grilla_{n}.db")
+    crear_base(ruta, filas, coordenadas)
+    API.RUTA_SQLITE = ruta
+
+    resultado = {"lugares": len(lugares), "filas": len(filas)}
+    tiempos = resultado["tiempos"] = {}
+
+    # Carga completa: lectura de la base y construcción de la instantánea
+    API.GRAFO = None
+    tiempos["carga"], grafo = _cronometrar(API.cargar_datos, 1)
+    resultado["aristas_adyacentes"] = grafo.contar_filas(solo_adyacentes=True)
+    resultado["componentes"] = grafo.n_componentes
+    resultado["tabla_rutas"] = grafo.tabla_dist is not None
+
+    tiempos["indice_alcance"], _ = _cronometrar(
+        lambda: indice_alcance(grafo.ady, API.LIMITE_CIERRE), repeticiones)
+    if len(grafo) <= API.LIMITE_TABLA_RUTAS:
+        tiempos["warshall_denso"], _ = _cronometrar(
+            lambda: warshall(grafo.matriz_adyacencia()), 1)
+        tiempos["floyd_warshall"], _ = _cronometrar(lambda: floyd_warshall(*grafo.csr), 1)
+
+    rng = random.Random(semilla)
+    pares = [(rng.randrange(len(grafo)), rng.randrange(len(grafo))) for _ in range(consultas)]
+
+    tiempos["conectividad"] = _estadisticas([
+        _duracion(lambda: grafo.conectado(i, j)) for i, j in pares])
+    modos = ([None] if grafo.tabla_dist is not None else []) + list(API.MODOS_CAMINO)
+    for modo in modos:
+        muestras, asentados = [], []
+        for i, j in pares:
+            inicio = time.perf_counter()
+            ruta_minima = API.dijkstra(grafo, i, j, modo)
+            muestras.append((time.perf_counter() - inicio) * 1000)
+            asentados.append(ruta_minima["nodos_asentados"] or 0)
+        tiempos[f"camino_{modo or 'tabla'}"] = dict(
+            _estadisticas(muestras), nodos_asentados_media=round(float(np.mean(asentados)), 1))
+
+    lote = [(rng.randrange(len(grafo)), rng.randrange(len(grafo))) for _ in range(consultas * 10)]
+    tiempos["lote"], _ = _cronometrar(lambda: API.resolver_lote(grafo, lote), 1)
+    tiempos["lote"]["pares"] = len(lote)
+
+    if grafo.tabla_dist is not None:
+        # Regresión: la tabla incremental debe coincidir con la reconstruida
+        resultado["incremental_desactualizadas"] = verificar_incremental(
+            grafo, directorio, min(consultas, 20), semilla)
+        if resultado["incremental_desactualizadas"]:
+            print(f"  ¡{resultado['incremental_desactualizadas']} tablas incrementales "
+                  f"distintas de la reconstrucción completa!", file=sys.stderr)
+
+    resultado["endpoints"] = medir_endpoints(API, grafo, pares, repeticiones)
+    return resultado
+
+def verificar_incremental(grafo, directorio, pruebas, semilla):
+    """Filas de la tabla de caminos que difieren entre con_cambios incremental y
+    la reconstrucción completa, sobre la instantánea en disco (float32).
+
+    Cada prueba multiplica por 5 el peso de una arista adyacente o la quita.
+    Devuelve el número de pruebas con alguna diferencia.
+    """
+    from grafo import abrir_snapshot, guardar_snapshot
+
+    ruta = os.path.join(directorio, "instantanea_verificacion")
+    guardar_snapshot(grafo, ruta)
+    abierto = abrir_snapshot(ruta)
+    rng = random.Random(semilla)
+    adyacentes = np.flatnonzero((grafo.adyacentes != 0) & (grafo.distancias > 0)).tolist()
+    desactualizadas = 0
+    for prueba in range(min(pruebas, len(adyacentes))):
+        k = rng.choice(adyacentes)
+        origen, destino = grafo.lugares[grafo.origenes[k]], grafo.lugares[grafo.destinos[k]]
+        cambio = [(origen, destino, float(grafo.distancias[k]) * 5, 1) if prueba % 4 else
+                  (origen, destino, float(grafo.distancias[k]), 0)]
+        incremental = np.asarray(abierto.con_cambios(cambio).tabla_dist, dtype=float)
+        completa = np.asarray(abierto.con_cambios(cambio, incremental=False).tabla_dist, dtype=float)
+        if not np.allclose(incremental, completa, rtol=1e-5, atol=1e-6):
+            desactualizadas += 1
+    return desactualizadas
+
+def medir_endpoints(API, grafo, pares, repeticiones):
+    """Tiempo y tamaño de respuesta de cada endpoint con la caché vacía"""
+    cliente = API.crear_app(cargar=False).test_client()
+    nombres = grafo.lugares
+    origen, destino = nombres[pares[0][0]], nombres[pares[0][1]]
+    peticiones = {
+        "lugares": ("GET", "/api/lugares", None),
+        "componentes": ("GET", "/api/componentes", None),
+        "conectividad": ("GET", f"/api/conectividad?origen={origen}&destino={destino}", None),
+        "camino_minimo": ("GET", f"/api/camino-minimo?origen={origen}&destino={destino}", None),
+        "conexiones_1000": ("GET", "/api/conexiones?limit=1000", None),
+        "conexiones_ndjson": ("GET", "/api/conexiones?formato=ndjson&solo_adyacentes=1", None),
+        "matrices_aristas": ("GET", "/api/matrices?formato=aristas", None),
+        "rutas_lote_100": ("POST", "/api/rutas-lote",
+                           {"pares": [[nombres[i], nombres[j]] for i, j in pares[:100]]}),
+    }
+    if len(grafo) <= API.LIMITE_MATRICES_DENSAS:
+        peticiones["matrices_json"] = ("GET", "/api/matrices", None)
+
+    resultados = {}
+    for nombre, (metodo, url, cuerpo) in peticiones.items():
+        muestras = []
+        for _ in range(repeticiones):
+            API.CACHE_CONSULTAS.limpiar()
+            API.CACHE_SERIALIZADA.limpiar()
+            inicio = time.perf_counter()
+            respuesta = cliente.open(url, method=metodo, json=cuerpo)
+            # get_data recorre las respuestas por tramos, así que entra en la medida
+            datos = respuesta.get_data()
+            muestras.append((time.perf_counter() - inicio) * 1000)
+        resultados[nombre] = dict(_estadisticas(muestras), estado=respuesta.status_code,
+                                  bytes=len(datos))
+    return resultados
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanos", default="100,1000,10000",
+                        help="lugares por grafo, separados por comas (hasta 100000)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--consultas", type=int, default=50,
+                        help="pares origen-destino por medición de caminos")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="archivo JSON (por defecto, salida estándar)")
+    args = parser.parse_args(argumentos)
+    tamanos = [int(t) for t in args.tamanos.split(",")]
+
+    import API
+    API.RUTA_SNAPSHOT = None
+
+    with tempfile.TemporaryDirectory(prefix="benchmark_grafo_") as directorio:
+        resultados = []
+        for n in tamanos:
+            print(f"Midiendo {n} lugares...", file=sys.stderr)
+            resultados.append(medir_tamano(API, n, directorio, args.repeticiones,
+                                           args.consultas, args.semilla))
+
+    informe = {
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "parametros": vars(args),
+        "resultados": resultados,
+    }
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class CacheResultados:
+    """Caché LRU acotada con caducidad (TTL) para resultados de consultas.
+
+    Las claves incluyen la versión del grafo, de modo que una recarga deja
+    inservibles las entradas anteriores; además se vacía explícitamente al
+    publicar un grafo nuevo para liberar memoria. Segura entre hilos.
+    """
+
+    def __init__(self, max_entradas=10000, ttl=300):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._bloqueo = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expirados = 0
+        self.desalojados = 0
+
+    def obtener(self, clave, calcular):
+        """Devuelve el valor en caché o lo calcula con calcular() y lo guarda"""
+        ahora = time.monotonic()
+        with self._bloqueo:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                valor, vence = entrada
+                if vence > ahora:
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return valor
+                del self._datos[clave]
+                self.expirados += 1
+            self.fallos += 1
+
+        # El cálculo se hace fuera del bloqueo: dos hilos pueden calcular la
+        # misma clave a la vez, pero ninguno espera por consultas ajenas
+        valor = calcular()
+
+        with self._bloqueo:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.desalojados += 1
+        return valor
+
+    def limpiar(self):
+        with self._bloqueo:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._bloqueo:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "ttl": self.ttl,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+                "expirados": self.expirados,
+                "desalojados": self.desalojados,
+            }
@@ -0,0 +1,31 @@
+"""Configuración compartida por la API y las herramientas de DatosBD.
+
+API.py la importa directamente; DatosBD/ingesta.py la importa con la misma
+ruta que usa para grafo.py. Así la base de datos, las tablas y los límites
+de la instantánea no se copian a mano entre los dos lados.
+"""
+
+# Configuración de la base de datos
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+    'database': 'quetzaltenango_grafo'
+}
+
+# Tabla de aristas (origen, destino, distancia_km, adyacente) y tabla opcional
+# con las coordenadas de cada lugar (lugar, x, y) para A*. Las unidades de las
+# coordenadas dan igual: la heurística se escala con las propias distancias.
+TABLA_ARISTAS = 'distancias_adyacencia'
+TABLA_COORDENADAS = 'coordenadas_lugares'
+
+# El grafo se guarda disperso (CSR). Estructuras cuadráticas solo hasta estos
+# tamaños: tabla de distancias entre todos los pares (Floyd-Warshall, en
+# lugares) y cierre en bits del DAG de componentes fuertemente conexas (en
+# componentes).
+# Floyd-Warshall es O(n³) y se paga en cada carga completa y en cada
+# con_cambios que no puede ser incremental, con el bloqueo de recarga tomado:
+# ~0.4 s con 500 lugares, ~4.7 s con 1000 y ~40 s con 2000. Por encima del
+# límite las rutas se calculan a pedido con Dijkstra / A*.
+LIMITE_TABLA_RUTAS = 500
+LIMITE_CIERRE = 4000
@@ -0,0 +1,881 @@
+import heapq
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# --------------------------------------------------
+# Conectividad
+# --------------------------------------------------
+
+def alcanzable(cierre, i, j):
+    """Consulta O(1) sobre el cierre empaquetado"""
+    byte, desplazamiento = divmod(j, 8)
+    return bool((cierre[i, byte] >> (7 - desplazamiento)) & 1)
+
+def alcanzable_bfs(indptr, indices, origen, destino):
+    """Búsqueda en anchura sobre CSR; se detiene al encontrar el destino.
+
+    Igual que el cierre, origen == destino solo cuenta si hay un ciclo.
+    """
+    visitado = np.zeros(len(indptr) - 1, dtype=bool)
+    frontera = [origen]
+    while frontera:
+        siguiente = []
+        for u in frontera:
+            for v in indices[indptr[u]:indptr[u + 1]].tolist():
+                if v == destino:
+                    return True
+                if not visitado[v]:
+                    visitado[v] = True
+                    siguiente.append(v)
+        frontera = siguiente
+    return False
+
+def alcance_bfs(indptr, indices, origen):
+    """Vector booleano de los nodos alcanzables desde origen (sin contarlo salvo ciclo)"""
+    alcanzado = np.zeros(len(indptr) - 1, dtype=bool)
+    frontera = [origen]
+    while frontera:
+        siguiente = []
+        for u in frontera:
+            for v in indices[indptr[u]:indptr[u + 1]].tolist():
+                if not alcanzado[v]:
+                    alcanzado[v] = True
+                    siguiente.append(v)
+        frontera = siguiente
+    return alcanzado
+
+def componentes_fuertes(indptr, indices):
+    """Componentes fuertemente conexas (Tarjan iterativo) sobre CSR.
+
+    Devuelve (componente de cada nodo como int32, número de componentes).
+    Los identificadores salen en orden topológico inverso: si hay una arista
+    de la componente a a otra b, entonces b < a.
+    """
+    n = len(indptr) - 1
+    indptr = indptr.tolist()
+    indices = indices.tolist()
+    orden = [-1] * n
+    bajo = [0] * n
+    en_pila = [False] * n
+    componente = [-1] * n
+    pila = []
+    contador = c = 0
+
+    for raiz in range(n):
+        if orden[raiz] != -1:
+            continue
+        orden[raiz] = bajo[raiz] = contador
+        contador += 1
+        pila.append(raiz)
+        en_pila[raiz] = True
+        # Pila de llamadas explícita: (nodo, posición del próximo vecino)
+        llamadas = [(raiz, indptr[raiz])]
+        while llamadas:
+            v, k = llamadas[-1]
+            if k < indptr[v + 1]:
+                llamadas[-1] = (v, k + 1)
+                w = indices[k]
+                if orden[w] == -1:
+                    orden[w] = bajo[w] = contador
+                    contador += 1
+                    pila.append(w)
+                    en_pila[w] = True
+                    llamadas.append((w, indptr[w]))
+                elif en_pila[w] and orden[w] < bajo[v]:
+                    bajo[v] = orden[w]
+                continue
+
+            llamadas.pop()
+            if llamadas:
+                u = llamadas[-1][0]
+                if bajo[v] < bajo[u]:
+                    bajo[u] = bajo[v]
+            if bajo[v] == orden[v]:
+                while True:
+                    w = pila.pop()
+                    en_pila[w] = False
+                    componente[w] = c
+                    if w == v:
+                        break
+                c += 1
+
+    return np.asarray(componente, dtype=np.int32), c
+
+def cierre_condensado(componentes, c, origenes, destinos):
+    """Cierre transitivo en bits del DAG de componentes (c x ceil(c/8) bytes).
+
+    Aprovecha el orden de componentes_fuertes: los sucesores de a tienen
+    identificador menor, así que al llegar a a sus filas ya están cerradas y
+    basta con una pasada sobre las aristas entre componentes.
+    """
+    co = componentes[origenes].astype(np.int64)
+    cd = componentes[destinos].astype(np.int64)
+    entre = co != cd
+    pares = np.unique(co[entre] * c + cd[entre])
+    indptr, sucesores, _ = construir_csr(c, pares // c, pares % c)
+
+    bits = np.zeros((c, (c + 7) // 8), dtype=np.uint8)
+    mascaras = (0x80 >> (sucesores & 7)).astype(np.uint8)
+    for a in range(c):
+        inicio, fin = indptr[a], indptr[a + 1]
+        if inicio == fin:
+            continue
+        propios = sucesores[inicio:fin]
+        bits[a] = np.bitwise_or.reduce(bits[propios], axis=0)
+        np.bitwise_or.at(bits[a], propios >> 3, mascaras[inicio:fin])
+    return bits
+
+def indice_alcance(ady, limite=None):
+    """Índice de alcanzabilidad a partir del CSR de adyacencia.
+
+    Devuelve (componentes, ciclicas, cierre): componente de cada nodo, si
+    cada componente contiene un ciclo (más de un nodo o un lazo) y el cierre
+    del DAG condensado, que se omite (None) si hay más de limite componentes.
+    """
+    indptr, indices = ady
+    componentes, c = componentes_fuertes(indptr, indices)
+    origenes = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    ciclicas = np.bincount(componentes, minlength=c) > 1
+    ciclicas[componentes[origenes[origenes == indices]]] = True
+    if limite is not None and c > limite:
+        return componentes, ciclicas, None
+    return componentes, ciclicas, cierre_condensado(componentes, c, origenes, indices)
+
+# --------------------------------------------------
+# Caminos mínimos
+# --------------------------------------------------
+
+def construir_csr(n, origenes, destinos, pesos=None):
+    """Lista de adyacencia compacta (CSR) a partir de una lista de aristas.
+
+    Devuelve (indptr, indices, pesos): los vecinos de i son
+    indices[indptr[i]:indptr[i + 1]], ordenados, con sus pesos
+    correspondientes (pesos es None si no se dieron).
+    """
+    origenes = np.asarray(origenes, dtype=np.int64)
+    destinos = np.asarray(destinos, dtype=np.int64)
+    orden = np.lexsort((destinos, origenes))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origenes, minlength=n), out=indptr[1:])
+    return indptr, destinos[orden], (None if pesos is None else np.asarray(pesos, dtype=float)[orden])
+
+def dijkstra_csr(indptr, indices, pesos, origen, destino=None, destinos=None):
+    """Dijkstra con montículo binario sobre CSR.
+
+    Si se indica destino (o un conjunto de destinos), se detiene en cuanto
+    quedan asentados. Devuelve (dist, prev) como listas de longitud n.
+    """
+    n = len(indptr) - 1
+    dist = [float('inf')] * n
+    prev = [-1] * n
+    dist[origen] = 0.0
+    asentado = [False] * n
+    heap = [(0.0, origen)]
+    pendientes = set(destinos) if destinos is not None else None
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if asentado[u]:
+            continue
+        asentado[u] = True
+        if u == destino:
+            break
+        if pendientes is not None:
+            pendientes.discard(u)
+            if not pendientes:
+                break
+
+        inicio, fin = indptr[u], indptr[u + 1]
+        for v, peso in zip(indices[inicio:fin].tolist(), pesos[inicio:fin].tolist()):
+            nueva_dist = d + peso
+            if nueva_dist < dist[v]:
+                dist[v] = nueva_dist
+                prev[v] = u
+                heapq.heappush(heap, (nueva_dist, v))
+
+    return dist, prev
+
+def caminos_desde(indptr, indices, pesos, origen, destinos):
+    """Una sola búsqueda desde origen para varios destinos.
+
+    Devuelve {destino: (distancia, camino en índices o None)}.
+    """
+    dist, prev = dijkstra_csr(indptr, indices, pesos, origen, destinos=destinos)
+    return {j: (dist[j], reconstruir_camino(prev, origen, j)) for j in destinos}
+
+def floyd_warshall(indptr, indices, pesos):
+    """Tabla de distancias y predecesores entre todos los pares.
+
+    Vectorizado por pivote con NumPy: O(n) pasadas de O(n²) cada una.
+    pred[i][j] es el nodo anterior a j en el camino mínimo desde i (-1 si no hay).
+    """
+    n = len(indptr) - 1
+    origenes = np.repeat(np.arange(n), np.diff(indptr))
+
+    dist = np.full((n, n), np.inf)
+    pred = np.full((n, n), -1, dtype=np.int32)
+    # Con aristas repetidas se queda la más corta
+    np.minimum.at(dist, (origenes, indices), pesos)
+    pred[origenes, indices] = origenes
+    np.fill_diagonal(dist, 0.0)
+
+    for k in range(n):
+        alternativa = dist[:, k, None] + dist[k]
+        mejora = alternativa < dist
+        if mejora.any():
+            np.copyto(dist, alternativa, where=mejora)
+            np.copyto(pred, np.broadcast_to(pred[k], (n, n)), where=mejora)
+    return dist, pred
+
+def reconstruir_camino(prev, origen, destino):
+    """Recorre los predecesores desde el destino; devuelve índices o None"""
+    if origen != destino and prev[destino] == -1:
+        return None
+
+    camino = [destino]
+    u = destino
+    while u != origen:
+        u = prev[u]
+        camino.append(u)
+    camino.reverse()
+    return camino
+
+def escala_heuristica(indptr, indices, pesos, coordenadas):
+    """Factor k tal que k * distancia euclídea nunca supera la distancia real.
+
+    Es el mínimo de peso / longitud euclídea sobre todas las aristas; por la
+    desigualdad triangular k * |u - t| es entonces una cota inferior (y
+    consistente) del camino de u a t, sean cuales sean las unidades de las
+    coordenadas. Devuelve None si falta alguna coordenada.
+    """
+    if coordenadas is None or np.isnan(coordenadas).any():
+        return None
+    origenes = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    longitudes = np.hypot(*(coordenadas[origenes] - coordenadas[indices]).T)
+    con_longitud = longitudes > 0
+    if not con_longitud.any():
+        return None
+    return float(np.min(pesos[con_longitud] / longitudes[con_longitud]))
+
+def camino_punto_a_punto(indptr, indices, pesos, origen, destino, heuristica=None):
+    """Dijkstra (o A* si se da heuristica, un arreglo h[v]) de origen a destino.
+
+    Devuelve (distancia, camino en índices o None, nodos asentados).
+    """
+    n = len(indptr) - 1
+    dist = [float('inf')] * n
+    prev = [-1] * n
+    dist[origen] = 0.0
+    asentado = [False] * n
+    h = heuristica.tolist() if heuristica is not None else None
+    heap = [(h[origen] if h else 0.0, origen)]
+    asentados = 0
+
+    while heap:
+        _, u = heapq.heappop(heap)
+        if asentado[u]:
+            continue
+        asentado[u] = True
+        asentados += 1
+        if u == destino:
+            break
+
+        d = dist[u]
+        inicio, fin = indptr[u], indptr[u + 1]
+        for v, peso in zip(indices[inicio:fin].tolist(), pesos[inicio:fin].tolist()):
+            nueva_dist = d + peso
+            if nueva_dist < dist[v]:
+                dist[v] = nueva_dist
+                prev[v] = u
+                heapq.heappush(heap, (nueva_dist + h[v] if h else nueva_dist, v))
+
+    return dist[destino], reconstruir_camino(prev, origen, destino), asentados
+
+def dijkstra_bidireccional(csr, csr_inverso, origen, destino):
+    """Dijkstra simultáneo desde el origen (hacia adelante) y desde el destino
+    (sobre las aristas invertidas). Se detiene cuando la suma de los mínimos
+    de ambos montículos alcanza la mejor distancia encontrada.
+
+    Devuelve (distancia, camino en índices o None, nodos asentados).
+    """
+    n = len(csr[0]) - 1
+    if origen == destino:
+        return 0.0, [origen], 0
+
+    dist = ([float('inf')] * n, [float('inf')] * n)
+    prev = ([-1] * n, [-1] * n)
+    asentado = ([False] * n, [False] * n)
+    heaps = ([(0.0, origen)], [(0.0, destino)])
+    dist[0][origen] = dist[1][destino] = 0.0
+    grafos = (csr, csr_inverso)
+    mejor, encuentro, asentados = float('inf'), -1, 0
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= mejor:
+            break
+        # Avanza el lado con la frontera de menor distancia
+        lado = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        d, u = heapq.heappop(heaps[lado])
+        if asentado[lado][u]:
+            continue
+        asentado[lado][u] = True
+        asentados += 1
+
+        indptr, indices, pesos = grafos[lado]
+        distancias, contrarias = dist[lado], dist[1 - lado]
+        inicio, fin = indptr[u], indptr[u + 1]
+        for v, peso in zip(indices[inicio:fin].tolist(), pesos[inicio:fin].tolist()):
+            nueva_dist = d + peso
+            if nueva_dist < distancias[v]:
+                distancias[v] = nueva_dist
+                prev[lado][v] = u
+                heapq.heappush(heaps[lado], (nueva_dist, v))
+            if distancias[v] + contrarias[v] < mejor:
+                mejor = distancias[v] + contrarias[v]
+                encuentro = v
+
+    if encuentro == -1:
+        return float('inf'), None, asentados
+
+    camino = reconstruir_camino(prev[0], origen, encuentro)
+    u = encuentro
+    while u != destino:
+        u = prev[1][u]
+        camino.append(u)
+    return mejor, camino, asentados
+
+# --------------------------------------------------
+# Instantánea del grafo
+# --------------------------------------------------
+
+class Grafo:
+    """Instantánea inmutable del grafo cargado.
+
+    Guarda la tabla de aristas tal como viene de distancias_adyacencia
+    (índices de origen/destino, distancia y bandera de adyacencia) y las
+    estructuras dispersas que se derivan de ella: la adyacencia y las aristas
+    transitables (adyacentes con distancia positiva) en CSR, y un índice de
+    alcanzabilidad por componentes fuertemente conexas (componente de cada
+    nodo más el cierre del DAG condensado). En grafos pequeños también guarda
+    la tabla de caminos mínimos; las matrices densas n x n solo se construyen
+    a pedido.
+
+    Nunca se modifica; una recarga construye otra instancia y reemplaza la
+    referencia global de una sola vez.
+    """
+
+    def __init__(self, lugares, origenes, destinos, distancias, adyacentes,
+                 version=1, limite_tabla=500, limite_cierre=4000, derivados=None, creado=None,
+                 coordenadas=None):
+        self.lugares = list(lugares)
+        self.indice = {lugar: i for i, lugar in enumerate(self.lugares)}
+        self.version = version
+        self.creado = creado if creado is not None else time.time()
+        self.limite_tabla = limite_tabla
+        self.limite_cierre = limite_cierre
+
+        # Los arreglos que ya vienen con el tipo adecuado (p. ej. np.memmap de
+        # una instantánea en disco) se usan tal cual, sin copiarlos
+        self.origenes = _arreglo(origenes, np.int64)
+        self.destinos = _arreglo(destinos, np.int64)
+        self.distancias = _arreglo(distancias, float)
+        self.adyacentes = _arreglo(adyacentes, int)
+        # Coordenadas (x, y) por lugar, NaN si se desconocen; solo las usa A*
+        self.coordenadas = None if coordenadas is None else _arreglo(coordenadas, float)
+
+        n = len(self.lugares)
+        if derivados is not None:
+            self.ady = derivados["ady"]
+            self.csr = derivados["csr"]
+            self.csr_inverso = derivados["csr_inverso"]
+            self.tabla_dist = derivados.get("tabla_dist")
+            self.tabla_pred = derivados.get("tabla_pred")
+        else:
+            self.ady, self.csr, self.csr_inverso = _estructuras(n, *self._columnas())
+            if n <= limite_tabla:
+                self.tabla_dist, self.tabla_pred = floyd_warshall(*self.csr)
+            else:
+                self.tabla_dist = self.tabla_pred = None
+
+        if derivados is not None and derivados.get("componentes") is not None:
+            self.componentes = derivados["componentes"]
+            self.ciclicas = derivados["ciclicas"]
+            self.cierre_componentes = derivados.get("cierre_componentes")
+        else:
+            self.componentes, self.ciclicas, self.cierre_componentes = \
+                indice_alcance(self.ady, limite_cierre)
+
+        self.escala_heuristica = escala_heuristica(*self.csr, self.coordenadas)
+
+        for arreglo in (self.origenes, self.destinos, self.distancias, self.adyacentes,
+                        self.coordenadas, *self.ady, *self.csr, *self.csr_inverso,
+                        self.componentes, self.ciclicas, self.cierre_componentes,
+                        self.tabla_dist, self.tabla_pred):
+            if arreglo is not None:
+                arreglo.flags.writeable = False
+
+    @classmethod
+    def desde_filas(cls, lugares, filas, coordenadas=None, **kwargs):
+        """Construye la instantánea a partir de tuplas (origen, destino, distancia_km, adyacente).
+
+        coordenadas, si se da, es un diccionario lugar -> (x, y). Si una arista
+        (origen, destino) aparece en varias filas vale la última, como en
+        con_cambios: todas las consultas ven entonces la misma arista.
+        """
+        indice = {lugar: i for i, lugar in enumerate(lugares)}
+        origenes, destinos, distancias, adyacentes = sin_repetidas(len(indice), *_columnas(indice, filas))
+        if coordenadas is not None:
+            coordenadas = arreglo_coordenadas(indice, coordenadas)
+        return cls(lugares, origenes, destinos, distancias, adyacentes,
+                   coordenadas=coordenadas, **kwargs)
+
+    def mismas_coordenadas(self, coordenadas):
+        """Compara con un diccionario lugar -> (x, y) (o None)"""
+        if coordenadas is None or self.coordenadas is None:
+            return coordenadas is None and self.coordenadas is None
+        # tobytes para que NaN == NaN
+        return arreglo_coordenadas(self.indice, coordenadas).tobytes() == \
+            np.asarray(self.coordenadas, dtype=float).tobytes()
+
+    def __len__(self):
+        return len(self.lugares)
+
+    @property
+    def n_aristas(self):
+        return len(self.origenes)
+
+    @property
+    def n_componentes(self):
+        return len(self.ciclicas)
+
+    def con_cambios(self, filas, incremental=True):
+        """Nueva instantánea con las filas dadas insertadas o reemplazadas.
+
+        Si son pocas (hasta una cuarta parte de los lugares) la tabla de
+        caminos se actualiza de forma incremental en lugar de recalcularse; el
+        índice de componentes se reconstruye solo si cambia alguna adyacencia.
+        Lanza KeyError si alguna fila menciona un lugar desconocido; en ese
+        caso hace falta una recarga completa.
+        """
+        n = len(self.lugares)
+        cambios = sin_repetidas(n, *_columnas(self.indice, filas))
+        parametros = dict(version=self.version + 1, limite_tabla=self.limite_tabla,
+                          limite_cierre=self.limite_cierre, coordenadas=self.coordenadas)
+
+        if not incremental or len(cambios[0]) > max(1, n // 4) or self.tabla_dist is None:
+            return Grafo(self.lugares, *_fusionar(n, self._columnas(), cambios), **parametros)
+
+        return Grafo(self.lugares, *_fusionar(n, self._columnas(), cambios),
+                     derivados=self._derivados_incrementales(cambios), **parametros)
+
+    def _columnas(self):
+        return self.origenes, self.destinos, self.distancias, self.adyacentes
+
+    def _derivados_incrementales(self, cambios):
+        """Tabla de caminos tras aplicar los cambios, sin recalcularla entera.
+
+        Los cambios se separan en dos pasos pasando por un grafo intermedio
+        que solo tiene lo peor de antes y después de cada arista:
+          1. antes -> intermedio: solo se pierden aristas o suben pesos; se
+             recalculan con Dijkstra únicamente las filas cuyos caminos
+             mínimos podían usar esas aristas.
+          2. intermedio -> después: solo se agregan aristas o bajan pesos; cada
+             una se incorpora con una pasada O(n²): min(D, D[:, u] + w + D[v, :]).
+
+        El índice de componentes es lineal en el tamaño del grafo: se conserva
+        si ninguna adyacencia cambia y si no se reconstruye.
+        """
+        n = len(self.lugares)
+        o, d, distancias, adyacentes = cambios
+
+        # Valores anteriores de cada arista cambiada (0 / no adyacente si no existía)
+        claves_base = self.origenes.astype(np.int64) * n + self.destinos
+        orden = np.argsort(claves_base, kind="stable")
+        ordenadas = claves_base[orden]
+        claves = o * n + d
+        if len(ordenadas):
+            posiciones = np.minimum(np.searchsorted(ordenadas, claves), len(ordenadas) - 1)
+            existe = ordenadas[posiciones] == claves
+            anteriores = orden[posiciones]
+            dist_ant = np.where(existe, self.distancias[anteriores], 0.0)
+            ady_ant = np.where(existe, self.adyacentes[anteriores], 0) != 0
+        else:
+            dist_ant = np.zeros(len(o))
+            ady_ant = np.zeros(len(o), dtype=bool)
+        ady_nue = adyacentes != 0
+
+        peso_ant = np.where(ady_ant & (dist_ant > 0), dist_ant, np.inf)
+        peso_nue = np.where(ady_nue & (distancias > 0), distancias, np.inf)
+        ady_mid = ady_ant & ady_nue
+        peso_mid = np.maximum(peso_ant, peso_nue)
+
+        dist = np.array(self.tabla_dist, dtype=float)
+        pred = np.array(self.tabla_pred, dtype=np.int32)
+
+        # Paso 1: filas con algún camino mínimo que usaba una arista encarecida
+        sube_peso = peso_mid > peso_ant
+        if sube_peso.any():
+            intermedio = _fusionar(n, self._columnas(), (
+                o, d, np.where(np.isfinite(peso_mid), peso_mid, 0.0), ady_mid.astype(int)))
+            _, csr_mid, _ = _estructuras(n, *intermedio)
+            # La tabla de una instantánea está en float32: las sumas que
+            # deberían coincidir difieren en el redondeo de ese tipo. Se marca
+            # con holgura relativa a su épsilon (marcar de más solo cuesta un
+            # Dijkstra; de menos deja la fila desactualizada)
+            holgura = 1 + 64 * max(np.finfo(self.tabla_dist.dtype).eps, np.finfo(self.distancias.dtype).eps)
+            afectadas = np.zeros(n, dtype=bool)
+            for u, v, w in zip(o[sube_peso].tolist(), d[sube_peso].tolist(),
+                               peso_ant[sube_peso].tolist()):
+                via = dist[:, u, None] + w + dist[v]
+                afectadas |= (np.isfinite(dist) & (via <= dist * holgura)).any(axis=1)
+            for i in np.flatnonzero(afectadas).tolist():
+                dist[i], pred[i] = dijkstra_csr(*csr_mid, i)
+
+        # Paso 2: aristas nuevas o más cortas
+        for u, v, w in zip(o[peso_nue < peso_mid].tolist(), d[peso_nue < peso_mid].tolist(),
+                           peso_nue[peso_nue < peso_mid].tolist()):
+            via = dist[:, u, None] + w + dist[v]
+            mejora = via < dist
+            if mejora.any():
+                pred_v = pred[v].copy()
+                np.copyto(dist, via, where=mejora)
+                np.copyto(pred, np.broadcast_to(pred_v, (n, n)), where=mejora)
+                pred[mejora[:, v], v] = u
+
+        ady, csr, csr_inverso = _estructuras(n, *_fusionar(n, self._columnas(), cambios))
+        derivados = {
+            "ady": ady,
+            "csr": csr,
+            "csr_inverso": csr_inverso,
+            "tabla_dist": dist,
+            "tabla_pred": pred,
+        }
+        if not (ady_ant != ady_nue).any():
+            derivados["componentes"] = self.componentes
+            derivados["ciclicas"] = self.ciclicas
+            derivados["cierre_componentes"] = self.cierre_componentes
+        return derivados
+
+    def mismas_filas(self, lugares, filas):
+        """Indica si lugares y filas coinciden con esta instantánea (sin recalcular nada)"""
+        if list(lugares) != self.lugares:
+            return False
+        try:
+            columnas = sin_repetidas(len(self.indice), *_columnas(self.indice, filas))
+        except KeyError:
+            return False
+        actuales = (self.origenes, self.destinos, self.distancias, self.adyacentes)
+        return all(np.array_equal(a, b) for a, b in zip(actuales, columnas))
+
+    def distancia_registrada(self, i, j):
+        """distancia_km de la fila (i, j) de la tabla, 0 si no existe"""
+        fila = np.flatnonzero((self.origenes == i) & (self.destinos == j))
+        return float(self.distancias[fila[-1]]) if len(fila) else 0.0
+
+    def heuristica(self, destino):
+        """h[v] admisible hacia destino para A*, o None si no hay coordenadas completas"""
+        if self.escala_heuristica is None:
+            return None
+        return self.escala_heuristica * np.hypot(*(self.coordenadas - self.coordenadas[destino]).T)
+
+    def componente(self, i):
+        return int(self.componentes[i])
+
+    def conectado(self, i, j):
+        """Hay camino de i a j.
+
+        En la misma componente siempre lo hay (de i a sí mismo solo si la
+        componente tiene un ciclo); entre componentes distintas se consulta el
+        cierre condensado, o BFS si hay demasiadas componentes para guardarlo.
+        """
+        ci, cj = self.componentes[i], self.componentes[j]
+        if ci == cj:
+            return i != j or bool(self.ciclicas[ci])
+        if self.cierre_componentes is not None:
+            return alcanzable(self.cierre_componentes, ci, cj)
+        return alcanzable_bfs(*self.ady, i, j)
+
+    def arista_directa(self, i, j):
+        """i y j son adyacentes (búsqueda binaria en la fila CSR de i)"""
+        indptr, indices = self.ady
+        vecinos = indices[indptr[i]:indptr[i + 1]]
+        k = np.searchsorted(vecinos, j)
+        return bool(k < len(vecinos) and vecinos[k] == j)
+
+    # Matrices densas n x n: solo para grafos pequeños y a pedido
+    def matriz_adyacencia(self):
+        n = len(self.lugares)
+        matriz = np.zeros((n, n), dtype=int)
+        matriz[self.origenes, self.destinos] = self.adyacentes
+        return matriz
+
+    def matriz_distancias(self):
+        n = len(self.lugares)
+        matriz = np.zeros((n, n), dtype=float)
+        matriz[self.origenes, self.destinos] = self.distancias
+        return matriz
+
+    def matriz_conectividad(self):
+        return self._filas_conectividad(0, len(self.lugares)).astype(int)
+
+    def _filas_conectividad(self, inicio, fin):
+        """Filas [inicio, fin) de la conectividad, expandidas desde el cierre condensado"""
+        n = len(self.lugares)
+        if self.cierre_componentes is None:
+            return np.array([alcance_bfs(*self.ady, i) for i in range(inicio, fin)],
+                            dtype=bool).reshape(fin - inicio, n)
+        componentes = np.asarray(self.componentes)
+        propias = componentes[inicio:fin]
+        condensadas = np.unpackbits(self.cierre_componentes[propias], axis=1,
+                                    count=self.n_componentes).astype(bool)
+        filas = condensadas[:, componentes]
+        filas |= propias[:, None] == componentes[None, :]
+        k = np.arange(fin - inicio)
+        filas[k, inicio + k] = self.ciclicas[propias]
+        return filas
+
+    def bloque_denso(self, inicio, fin):
+        """Filas [inicio, fin) de las matrices de adyacencia, distancias y conectividad.
+
+        Permite recorrer las matrices por tramos sin construir las n x n completas.
+        """
+        n = len(self.lugares)
+        filas = fin - inicio
+        en_rango = (self.origenes >= inicio) & (self.origenes < fin)
+        origenes = self.origenes[en_rango] - inicio
+        destinos = self.destinos[en_rango]
+
+        ady = np.zeros((filas, n), dtype=int)
+        dist = np.zeros((filas, n), dtype=float)
+        ady[origenes, destinos] = self.adyacentes[en_rango]
+        dist[origenes, destinos] = self.distancias[en_rango]
+
+        return ady, dist, self._filas_conectividad(inicio, fin).astype(int)
+
+    def aristas_adyacentes(self):
+        """(origenes, destinos, distancias) de las aristas marcadas como adyacentes"""
+        adyacente = self.adyacentes != 0
+        return self.origenes[adyacente], self.destinos[adyacente], self.distancias[adyacente]
+
+    def contar_filas(self, solo_adyacentes=False):
+        return int(np.count_nonzero(self.adyacentes)) if solo_adyacentes else self.n_aristas
+
+    def filas(self, inicio=0, fin=None, solo_adyacentes=False):
+        """Genera las aristas [inicio, fin) como diccionarios con las columnas de la tabla.
+
+        Con solo_adyacentes el rango se cuenta sobre las aristas adyacentes.
+        """
+        lugares = self.lugares
+        if solo_adyacentes:
+            seleccion = np.flatnonzero(self.adyacentes)[inicio:fin]
+        else:
+            seleccion = slice(inicio, fin)
+        origenes = self.origenes[seleccion]
+        destinos = self.destinos[seleccion]
+        # round(6) quita el ruido de los pesos float32 de una instantánea en disco
+        distancias = self.distancias[seleccion].astype(float).round(6)
+        adyacentes = self.adyacentes[seleccion]
+
+        for i, j, distancia, adyacente in zip(origenes.tolist(), destinos.tolist(),
+                                               distancias.tolist(), adyacentes.tolist()):
+            yield {
+                "origen": lugares[i],
+                "destino": lugares[j],
+                "distancia_km": distancia,
+                "adyacente": adyacente
+            }
+
+def _estructuras(n, origenes, destinos, distancias, adyacentes):
+    """CSR de adyacencia, de aristas transitables y de transitables invertidas"""
+    adyacente = adyacentes != 0
+    ady = construir_csr(n, origenes[adyacente], destinos[adyacente])[:2]
+    transitable = adyacente & (distancias > 0)
+    csr = construir_csr(n, origenes[transitable], destinos[transitable], distancias[transitable])
+    csr_inverso = construir_csr(n, destinos[transitable], origenes[transitable], distancias[transitable])
+    return ady, csr, csr_inverso
+
+def _fusionar(n, base, cambios):
+    """Columnas de base con las filas de cambios insertadas o reemplazadas"""
+    claves = np.concatenate([
+        base[0].astype(np.int64) * n + base[1],
+        cambios[0].astype(np.int64) * n + cambios[1]
+    ])
+    # np.unique sobre el arreglo invertido conserva la última aparición de cada clave
+    _, ultimas = np.unique(claves[::-1], return_index=True)
+    seleccion = np.sort(len(claves) - 1 - ultimas)
+    return tuple(np.concatenate([b, c])[seleccion] for b, c in zip(base, cambios))
+
+def sin_repetidas(n, origenes, destinos, distancias, adyacentes):
+    """Deja solo la última fila de cada arista (origen, destino), en el orden de llegada"""
+    vacio = (np.zeros(0, dtype=np.int64),) * 2 + (np.zeros(0), np.zeros(0, dtype=int))
+    return _fusionar(n, vacio, (origenes, destinos, distancias, adyacentes))
+
+def arreglo_coordenadas(indice, coordenadas):
+    """{lugar: (x, y)} -> arreglo n x 2 con NaN para los lugares sin coordenadas"""
+    arreglo = np.full((len(indice), 2), np.nan)
+    for lugar, (x, y) in coordenadas.items():
+        if lugar in indice:
+            arreglo[indice[lugar]] = (x, y)
+    return arreglo
+
+def _arreglo(valores, dtype):
+    if isinstance(valores, np.ndarray) and valores.dtype.kind == np.dtype(dtype).kind:
+        return valores
+    return np.asarray(valores, dtype=dtype)
+
+def _columnas(indice, filas):
+    """Tuplas (origen, destino, distancia_km, adyacente) -> arreglos por columna"""
+    if not filas:
+        return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=float), np.zeros(0, dtype=int))
+    origenes, destinos, distancias, adyacentes = zip(*filas)
+    return (
+        np.fromiter(map(indice.__getitem__, origenes), dtype=np.int64, count=len(filas)),
+        np.fromiter(map(indice.__getitem__, destinos), dtype=np.int64, count=len(filas)),
+        np.asarray(distancias, dtype=float),
+        np.asarray(adyacentes, dtype=int),
+    )
+
+# --------------------------------------------------
+# Instantánea binaria en disco
+# --------------------------------------------------
+#
+# Un directorio con manifiesto.json, lugares.json y un .npy por arreglo.
+# Los pesos se guardan en float32 y los índices en int32. Al abrirla, cada
+# .npy se mapea en memoria (np.load con mmap_mode='r', que devuelve np.memmap),
+# de modo que varios procesos comparten las mismas páginas del caché del
+# sistema y el arranque no depende de la base de datos.
+
+FORMATO_SNAPSHOT = 4
+
+_ARREGLOS_SNAPSHOT = {
+    "origenes": np.int32,
+    "destinos": np.int32,
+    "distancias": np.float32,
+    "adyacentes": np.int8,
+    "ady_indptr": np.int64,
+    "ady_indices": np.int32,
+    "csr_indptr": np.int64,
+    "csr_indices": np.int32,
+    "csr_pesos": np.float32,
+    "csr_inv_indptr": np.int64,
+    "csr_inv_indices": np.int32,
+    "csr_inv_pesos": np.float32,
+    "coordenadas": np.float64,
+    "componentes": np.int32,
+    "ciclicas": np.bool_,
+    "cierre_componentes": np.uint8,
+    "tabla_dist": np.float32,
+    "tabla_pred": np.int32,
+}
+
+def guardar_snapshot(grafo, ruta, incluir_tablas=True):
+    """Escribe la instantánea en el directorio ruta (reemplazándolo de forma atómica)"""
+    temporal = ruta.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    indptr, indices, pesos = grafo.csr
+    arreglos = {
+        "origenes": grafo.origenes,
+        "destinos": grafo.destinos,
+        "distancias": grafo.distancias,
+        "adyacentes": grafo.adyacentes,
+        "ady_indptr": grafo.ady[0],
+        "ady_indices": grafo.ady[1],
+        "csr_indptr": indptr,
+        "csr_indices": indices,
+        "csr_pesos": pesos,
+        "csr_inv_indptr": grafo.csr_inverso[0],
+        "csr_inv_indices": grafo.csr_inverso[1],
+        "csr_inv_pesos": grafo.csr_inverso[2],
+    }
+    if grafo.coordenadas is not None:
+        arreglos["coordenadas"] = grafo.coordenadas
+    # El índice de componentes es O(n) y se guarda siempre; su cierre
+    # condensado va con las tablas
+    arreglos["componentes"] = grafo.componentes
+    arreglos["ciclicas"] = grafo.ciclicas
+    if incluir_tablas:
+        if grafo.cierre_componentes is not None:
+            arreglos["cierre_componentes"] = grafo.cierre_componentes
+        if grafo.tabla_dist is not None:
+            arreglos["tabla_dist"] = grafo.tabla_dist
+            arreglos["tabla_pred"] = grafo.tabla_pred
+
+    for nombre, arreglo in arreglos.items():
+        np.save(os.path.join(temporal, nombre + ".npy"),
+                np.asarray(arreglo, dtype=_ARREGLOS_SNAPSHOT[nombre]))
+
+    with open(os.path.join(temporal, "lugares.json"), "w", encoding="utf-8") as f:
+        json.dump(grafo.lugares, f, ensure_ascii=False)
+
+    manifiesto = {
+        "formato": FORMATO_SNAPSHOT,
+        "version": grafo.version,
+        "creado": grafo.creado,
+        "lugares": len(grafo),
+        "aristas": grafo.n_aristas,
+        "limite_tabla": grafo.limite_tabla,
+        "limite_cierre": grafo.limite_cierre,
+        "arreglos": sorted(arreglos),
+    }
+    with open(os.path.join(temporal, "manifiesto.json"), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2)
+
+    # Los procesos que tengan mapeada la versión anterior la siguen viendo
+    # hasta que la cierren: borrar los archivos no invalida sus mapeos
+    anterior = ruta.rstrip(os.sep) + ".old"
+    shutil.rmtree(anterior, ignore_errors=True)
+    if os.path.exists(ruta):
+        os.rename(ruta, anterior)
+    os.rename(temporal, ruta)
+    shutil.rmtree(anterior, ignore_errors=True)
+    return manifiesto
+
+def abrir_snapshot(ruta):
+    """Abre una instantánea en disco con sus arreglos mapeados en memoria"""
+    with open(os.path.join(ruta, "manifiesto.json"), encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    if manifiesto.get("formato") != FORMATO_SNAPSHOT:
+        raise ValueError(f"Formato de instantánea no soportado: {manifiesto.get('formato')}")
+
+    with open(os.path.join(ruta, "lugares.json"), encoding="utf-8") as f:
+        lugares = json.load(f)
+
+    arreglos = {
+        nombre: np.load(os.path.join(ruta, nombre + ".npy"), mmap_mode="r")
+        for nombre in manifiesto["arreglos"]
+    }
+
+    # Sin tablas (--sin-tablas) la conectividad entre componentes distintas se
+    # resuelve por BFS y las rutas con Dijkstra sobre el CSR
+    derivados = {
+        "ady": (arreglos["ady_indptr"], arreglos["ady_indices"]),
+        "csr": (arreglos["csr_indptr"], arreglos["csr_indices"], arreglos["csr_pesos"]),
+        "csr_inverso": (arreglos["csr_inv_indptr"], arreglos["csr_inv_indices"],
+                        arreglos["csr_inv_pesos"]),
+        "componentes": arreglos["componentes"],
+        "ciclicas": arreglos["ciclicas"],
+        "cierre_componentes": arreglos.get("cierre_componentes"),
+        "tabla_dist": arreglos.get("tabla_dist"),
+        "tabla_pred": arreglos.get("tabla_pred"),
+    }
+
+    return Grafo(
+        lugares,
+        arreglos["origenes"],
+        arreglos["destinos"],
+        arreglos["distancias"],
+        arreglos["adyacentes"],
+        version=manifiesto["version"],
+        limite_tabla=manifiesto["limite_tabla"],
+        limite_cierre=manifiesto["limite_cierre"],
+        derivados=derivados,
+        creado=manifiesto["creado"],
+        coordenadas=arreglos.get("coordenadas"),
+    )
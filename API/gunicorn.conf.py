@@ -0,0 +1,43 @@
+# Configuración de gunicorn para producción (ejecutar desde API/):
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#
+# preload_app carga el grafo en el maestro antes de bifurcar: los arreglos
+# NumPy quedan compartidos entre trabajadores por copia al escribir (o por el
+# mapeo en memoria si se usa GRAFO_SNAPSHOT), sin una carga por trabajador.
+import gc
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('API_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('API_TRABAJADORES', min(4, os.cpu_count() or 1)))
+# Hilos por trabajador para las consultas baratas; los cálculos pesados van al
+# pool de procesos de cada trabajador (API_PROCESOS_CALCULO)
+worker_class = 'gthread'
+threads = int(os.environ.get('API_HILOS', 8))
+preload_app = True
+timeout = 120
+graceful_timeout = 30
+
+os.environ.setdefault('API_PROCESOS_CALCULO', '2')
+os.environ.setdefault('API_LIMITE_CALCULOS', '2')
+
+# Cada trabajador tiene su propio grafo: con más de uno, los cambios (POST
+# /api/aristas, /api/admin/recargar, recarga periódica) se reparten por una
+# instantánea en GRAFO_COMPARTIDO (ver RUTA_COMPARTIDA en API.py). Se usa un
+# directorio nuevo en cada arranque; si se define a mano, no debe quedar una
+# instantánea de una ejecución anterior o los trabajadores la tomarían.
+_DIRECTORIO_COMPARTIDO = None
+if workers > 1 and 'GRAFO_COMPARTIDO' not in os.environ:
+    _DIRECTORIO_COMPARTIDO = tempfile.mkdtemp(prefix='grafo_compartido_')
+    os.environ['GRAFO_COMPARTIDO'] = os.path.join(_DIRECTORIO_COMPARTIDO, 'grafo')
+
+def pre_fork(server, worker):
+    # Saca los objetos ya creados (el grafo cargado) del recolector de basura
+    # para que no escriba en sus páginas y rompa la compartición
+    gc.freeze()
+
+def on_exit(server):
+    if _DIRECTORIO_COMPARTIDO:
+        shutil.rmtree(_DIRECTORIO_COMPARTIDO, ignore_errors=True)
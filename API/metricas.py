@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from io import StringIO
+import itertools
+import os
+import pstats
+import threading
+import time
+
+# Límites (en segundos) de los histogramas de latencia
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metricas:
+    """Contadores, indicadores e histogramas con etiquetas.
+
+    Se exportan en el formato de texto de Prometheus (exposition format
+    0.0.4), así que no hace falta el cliente oficial. Segura entre hilos.
+    """
+
+    def __init__(self):
+        self._definiciones = OrderedDict()
+        self._series = {}
+        self._bloqueo = threading.Lock()
+
+    def contador(self, nombre, ayuda):
+        self._definiciones[nombre] = ("counter", ayuda, None)
+
+    def indicador(self, nombre, ayuda):
+        self._definiciones[nombre] = ("gauge", ayuda, None)
+
+    def histograma(self, nombre, ayuda, limites=LIMITES_LATENCIA):
+        self._definiciones[nombre] = ("histogram", ayuda, tuple(limites))
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._bloqueo:
+            self._series[clave] = self._series.get(clave, 0) + valor
+
+    def fijar(self, nombre, valor, **etiquetas):
+        """Valor absoluto de un indicador (o de un contador que se lleva en otra parte)"""
+        with self._bloqueo:
+            self._series[(nombre, tuple(sorted(etiquetas.items())))] = valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        limites = self._definiciones[nombre][2]
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._bloqueo:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(limites), 0.0, 0]
+            for k, limite in enumerate(limites):
+                if valor <= limite:
+                    serie[0][k] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def texto(self):
+        with self._bloqueo:
+            series = {clave: (list(valor[0]), valor[1], valor[2]) if isinstance(valor, list) else valor
+                      for clave, valor in self._series.items()}
+
+        lineas = []
+        for nombre, (tipo, ayuda, limites) in self._definiciones.items():
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for (serie, etiquetas), valor in sorted(series.items(), key=lambda s: s[0]):
+                if serie != nombre:
+                    continue
+                if tipo != "histogram":
+                    lineas.append(f"{nombre}{_etiquetas(etiquetas)} {_numero(valor)}")
+                    continue
+                cuentas, suma, total = valor
+                acumulado = 0
+                for limite, cuenta in zip(limites, cuentas):
+                    acumulado += cuenta
+                    lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', _numero(limite)),))} {acumulado}")
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', '+Inf'),))} {total}")
+                lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {_numero(suma)}")
+                lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {total}")
+        return "\n".join(lineas) + "\n"
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    pares = (
+        '%s="%s"' % (clave, str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for clave, valor in etiquetas
+    )
+    return "{" + ",".join(pares) + "}"
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class AlmacenPerfiles:
+    """Últimos perfiles cProfile de peticiones, con su resumen en texto.
+
+    Guarda como máximo max_perfiles en memoria; con directorio, además
+    escribe cada perfil como .prof (se abre con pstats o snakeviz).
+    """
+
+    def __init__(self, max_perfiles=50, directorio=None):
+        self.max_perfiles = max_perfiles
+        self.directorio = directorio
+        self._perfiles = OrderedDict()
+        self._bloqueo = threading.Lock()
+        self._secuencia = itertools.count(1)
+
+    def nuevo_nombre(self):
+        return f"{int(time.time())}-{next(self._secuencia)}"
+
+    def guardar(self, perfil, nombre=None, lineas=40, **datos):
+        """Guarda un cProfile.Profile ya detenido; devuelve su nombre"""
+        nombre = nombre or self.nuevo_nombre()
+        salida = StringIO()
+        pstats.Stats(perfil, stream=salida).sort_stats("cumulative").print_stats(lineas)
+        entrada = dict(datos, nombre=nombre, fecha=time.time(), texto=salida.getvalue())
+        if self.directorio:
+            os.makedirs(self.directorio, exist_ok=True)
+            entrada["archivo"] = os.path.join(self.directorio, nombre + ".prof")
+            perfil.dump_stats(entrada["archivo"])
+
+        with self._bloqueo:
+            self._perfiles[nombre] = entrada
+            while len(self._perfiles) > self.max_perfiles:
+                self._perfiles.popitem(last=False)
+        return nombre
+
+    def listar(self):
+        with self._bloqueo:
+            return [{clave: valor for clave, valor in entrada.items() if clave != "texto"}
+                    for entrada in reversed(self._perfiles.values())]
+
+    def obtener(self, nombre):
+        with self._bloqueo:
+            return self._perfiles.get(nombre)
@@ -0,0 +1,125 @@
+"""Serialización de respuestas.
+
+JSON con orjson si está instalado (convierte arreglos NumPy sin pasar por
+listas de Python) y con json de la biblioteca estándar si no. Las filas de
+matrices 0/1 pueden enviarse como cadenas de bits o como rachas, y los
+cuerpos se comprimen con gzip (o brotli, si está instalado) según
+Accept-Encoding.
+"""
+import json
+import zlib
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+NIVEL_GZIP = 6
+NIVEL_BROTLI = 5
+
+# Codificaciones de las filas de matrices 0/1 (adyacencia y conectividad)
+CODIFICACIONES = ('lista', 'bits', 'rle')
+
+def _por_defecto(valor):
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"{type(valor).__name__} no es serializable a JSON")
+
+def a_json(valor, ordenar=False, default=None):
+    """valor -> bytes JSON compactos en UTF-8; acepta arreglos y escalares NumPy.
+
+    orjson escribe los NaN como null; json de la biblioteca estándar, como NaN.
+    """
+    def por_defecto(v):
+        try:
+            return _por_defecto(v)
+        except TypeError:
+            if default is None:
+                raise
+            return default(v)
+
+    if orjson is not None:
+        opciones = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if ordenar:
+            opciones |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(valor, default=por_defecto, option=opciones)
+    return json.dumps(valor, ensure_ascii=False, separators=(',', ':'), sort_keys=ordenar,
+                      default=por_defecto).encode('utf-8')
+
+class ProveedorJSON(DefaultJSONProvider):
+    """Proveedor de Flask (app.json) que usa a_json en jsonify"""
+
+    def dumps(self, obj, **kwargs):
+        return a_json(obj, ordenar=kwargs.get('sort_keys', self.sort_keys),
+                      default=kwargs.get('default', self.default)).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(a_json(obj, ordenar=self.sort_keys, default=self.default),
+                                        mimetype=self.mimetype)
+
+def fila_bits(fila):
+    """Fila 0/1 -> cadena '0110...' (un carácter por columna)"""
+    return ((np.asarray(fila) != 0).view(np.uint8) + ord('0')).tobytes().decode('ascii')
+
+def fila_rachas(fila):
+    """Fila 0/1 -> [v, l1, l2, ...]: valor de la primera racha y largo de cada
+    racha, alternando entre 0 y 1"""
+    fila = np.asarray(fila) != 0
+    if not len(fila):
+        return []
+    cortes = np.flatnonzero(fila[1:] != fila[:-1]) + 1
+    largos = np.diff(np.concatenate(([0], cortes, [len(fila)])))
+    return [int(fila[0])] + largos.tolist()
+
+def codificar_filas(bloque, codificacion):
+    """Bloque de filas 0/1 en la codificación pedida (lista deja el arreglo tal cual)"""
+    if codificacion == 'bits':
+        return [fila_bits(fila) for fila in bloque]
+    if codificacion == 'rle':
+        return [fila_rachas(fila) for fila in bloque]
+    return bloque
+
+def elegir_compresion(aceptadas):
+    """'br', 'gzip' o None según el Accept-Encoding de la petición"""
+    if brotli is not None and aceptadas['br']:
+        return 'br'
+    if aceptadas['gzip']:
+        return 'gzip'
+    return None
+
+def _compresor(metodo):
+    if metodo == 'br':
+        compresor = brotli.Compressor(quality=NIVEL_BROTLI)
+        return compresor.process, compresor.finish
+    # wbits=31: formato gzip (cabecera y CRC) en lugar de zlib
+    compresor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+    return compresor.compress, compresor.flush
+
+def comprimir(datos, metodo):
+    procesar, terminar = _compresor(metodo)
+    return procesar(datos) + terminar()
+
+def comprimir_flujo(trozos, metodo):
+    """Comprime una respuesta por tramos a medida que se genera"""
+    procesar, terminar = _compresor(metodo)
+    try:
+        for trozo in trozos:
+            comprimido = procesar(trozo.encode('utf-8') if isinstance(trozo, str) else trozo)
+            if comprimido:
+                yield comprimido
+        yield terminar()
+    finally:
+        cerrar = getattr(trozos, 'close', None)
+        if cerrar is not None:
+            cerrar()
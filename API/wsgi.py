@@ -0,0 +1,11 @@
+"""Punto de entrada WSGI.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Con preload_app (ver gunicorn.conf.py) este módulo se importa en el proceso
+maestro, así que el grafo se carga una sola vez antes de crear los
+trabajadores.
+"""
+from API import crear_app
+
+app = crear_app()
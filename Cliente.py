@@ -1,12 +1,51 @@
 
 import flet as ft
+import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import networkx as nx
-import matplotlib.pyplot as plt
+import numpy as np
 from io import BytesIO
 import base64
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import matplotlib
 matplotlib.use('Agg')
+import matplotlib.image as mpimg
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+FIGURA_PULGADAS = (20, 16)
+FIGURA_DPI = 100
+MAX_IMAGENES_CACHE = 32
+
+API_URL = os.environ.get("API_URL", "http://localhost:5000")
+API_TIMEOUT = (3.05, 30)  # (conexión, lectura) en segundos
+API_REINTENTOS = 3
+
+
+class ClienteAPI:
+    """Acceso a la API con una sesión compartida: reutiliza conexiones TCP,
+    aplica timeouts y reintenta los GET ante fallos de conexión o 502/503/504"""
+
+    def __init__(self, base_url=API_URL, timeout=API_TIMEOUT, reintentos=API_REINTENTOS):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(total=reintentos, backoff_factor=0.3,
+                              status_forcelist=(502, 503, 504), allowed_methods=("GET",)),
+        )
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+
+    def get(self, ruta, **params):
+        return self.session.get(self.base_url + ruta, params=params or None, timeout=self.timeout)
+
 
 class FletGrafoApp:
     def __init__(self, page: ft.Page):
@@ -24,6 +63,17 @@ class FletGrafoApp:
         self.lugares = []
         self.grafo_completo = None
         self._node_positions = None
+        self._visibles = None
+        self._capas_base = {}
+        self._imagenes = OrderedDict()
+        # Las capas, las imágenes en caché y el grafo que se dibuja solo se tocan
+        # desde el hilo de dibujo; el contador de solicitudes, con su candado
+        self._dibujante = ThreadPoolExecutor(max_workers=1)
+        self._solicitud_render = 0
+        self._bloqueo_render = threading.Lock()
+        # Las peticiones HTTP se hacen en estos hilos para no bloquear la UI
+        self.api = ClienteAPI()
+        self._red = ThreadPoolExecutor(max_workers=4)
 
     def setup_ui(self):
         self.title = ft.Text("Sistema de Rutas Cortas", size=24, weight=ft.FontWeight.BOLD)
@@ -50,38 +100,44 @@ class FletGrafoApp:
         ], spacing=15))
 
     def cargar_lugares(self):
+        # Lugares y grafo se piden en paralelo
+        self._red.submit(self._cargar_lugares)
+        self._red.submit(self.construir_grafo_completo)
+
+    def _cargar_lugares(self):
         try:
-            response = requests.get("http://localhost:5000/api/lugares")
+            response = self.api.get("/api/lugares")
             if response.status_code == 200:
                 self.lugares = response.json().get("lugares", [])
                 self.actualizar_dropdowns()
-                self.construir_grafo_completo()
         except Exception as e:
             self.mostrar_mensaje(f"Error cargando lugares: {str(e)}", "red")
 
     def construir_grafo_completo(self):
+        # Una sola petición: lista compacta de aristas [i, j, distancia]
         try:
-            response = requests.get("http://localhost:5000/api/matrices")
+            response = self.api.get("/api/matrices", formato="aristas")
             if response.status_code == 200:
                 data = response.json()
-                self.grafo_completo = nx.DiGraph()
-                self.grafo_completo.add_nodes_from(data["lugares"])
-
-                for i, origen in enumerate(data["lugares"]):
-                    for j, destino in enumerate(data["lugares"]):
-                        if data["matriz_adyacencia"][i][j] == 1:
-                            try:
-                                distancia_response = requests.get(
-                                    f"http://localhost:5000/api/distancia?origen={origen}&destino={destino}"
-                                )
-                                if distancia_response.status_code == 200:
-                                    distancia = distancia_response.json().get("distancia", 0)
-                                    self.grafo_completo.add_edge(origen, destino, weight=distancia)
-                            except Exception as e:
-                                print(f"Error obteniendo distancia entre {origen} y {destino}: {str(e)}")
+                lugares = data["lugares"]
+                grafo = nx.DiGraph()
+                grafo.add_nodes_from(lugares)
+                grafo.add_weighted_edges_from(
+                    (lugares[i], lugares[j], distancia) for i, j, distancia in data["aristas"]
+                )
+                # El reemplazo va por el hilo de dibujo, detrás de lo que esté dibujando
+                self._dibujante.submit(self._instalar_grafo, grafo)
         except Exception as e:
             print(f"Error construyendo grafo completo: {str(e)}")
 
+    def _instalar_grafo(self, grafo):
+        # Grafo nuevo: las capas e imágenes en caché ya no sirven
+        self.grafo_completo = grafo
+        self._node_positions = None
+        self._visibles = None
+        self._capas_base = {}
+        self._imagenes = OrderedDict()
+
     def actualizar_dropdowns(self):
         if not self.lugares:
             return
@@ -98,10 +154,11 @@ class FletGrafoApp:
             self.mostrar_mensaje("Seleccione origen y destino", "red")
             return
 
+        self._red.submit(self._calcular_ruta, origen, destino)
+
+    def _calcular_ruta(self, origen, destino):
         try:
-            respuesta = requests.get(
-                f"http://localhost:5000/api/camino-minimo?origen={origen}&destino={destino}"
-            ).json()
+            respuesta = self.api.get("/api/camino-minimo", origen=origen, destino=destino).json()
 
             if "error" in respuesta:
                 self.mostrar_mensaje(respuesta["error"], "red")
@@ -120,10 +177,11 @@ class FletGrafoApp:
             self.mostrar_mensaje("Seleccione origen y destino", "red")
             return
 
+        self._red.submit(self._verificar_conectividad, origen, destino)
+
+    def _verificar_conectividad(self, origen, destino):
         try:
-            respuesta = requests.get(
-                f"http://localhost:5000/api/conectividad?origen={origen}&destino={destino}"
-            ).json()
+            respuesta = self.api.get("/api/conectividad", origen=origen, destino=destino).json()
 
             if "error" in respuesta:
                 self.mostrar_mensaje(respuesta["error"], "red")
@@ -194,80 +252,130 @@ class FletGrafoApp:
                     self._node_positions[node] = (0.5, 0.5)
         return self._node_positions
 
+    def _aristas_visibles(self):
+        if self._visibles is None:
+            pos = self._get_node_positions()
+            self._visibles = [
+                edge for edge in self.grafo_completo.edges()
+                if abs(pos[edge[0]][0] - pos[edge[1]][0]) < 0.5 and abs(pos[edge[0]][1] - pos[edge[1]][1]) < 0.5
+            ]
+        return self._visibles
+
+    def _renderizar_capa(self, dibujar, transparente=False):
+        # Figure + canvas Agg propios (sin pyplot) para poder dibujar fuera del hilo de la UI.
+        # Todas las capas usan el mismo tamaño y límites, así se pueden superponer píxel a píxel.
+        fig = Figure(figsize=FIGURA_PULGADAS, dpi=FIGURA_DPI)
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.add_axes([0, 0, 1, 1])
+        dibujar(ax, self._get_node_positions())
+        ax.set_xlim(-0.1, 1.1)
+        ax.set_ylim(-0.1, 1.4)
+        ax.axis('off')
+        if transparente:
+            fig.patch.set_alpha(0)
+        canvas.draw()
+        return np.asarray(canvas.buffer_rgba()).copy()
+
+    def _capa_base(self, estilo):
+        """Nodos, etiquetas, aristas y pesos: se dibujan una vez por estilo"""
+        if estilo not in self._capas_base:
+            grafo = self.grafo_completo
+            visibles = self._aristas_visibles()
+
+            def dibujar(ax, pos):
+                #modificar aqui
+                nx.draw_networkx_nodes(grafo, pos, ax=ax, node_size=3500, node_color="lightgreen", alpha=0.9, edgecolors="blue", linewidths=1)
+                nx.draw_networkx_labels(grafo, pos, ax=ax, font_size=12, font_weight="bold", font_color="black", bbox=dict(alpha=0))
+                if estilo == "ruta":
+                    nx.draw_networkx_edges(grafo, pos, ax=ax, edge_color="gray", arrows=True, arrowstyle="->", arrowsize=10, width=1.0, alpha=0.5)
+                else:
+                    nx.draw_networkx_edges(grafo, pos, ax=ax, edgelist=visibles, edge_color="gray", arrows=True, arrowstyle="->", arrowsize=10, width=1.5, alpha=0.7)
+                edge_labels = {edge: grafo.edges[edge]['weight'] for edge in visibles}
+                nx.draw_networkx_edge_labels(grafo, pos, ax=ax, edge_labels=edge_labels, font_size=7, label_pos=0.5, bbox=dict(facecolor="white", alpha=0.6, edgecolor="none"))
+
+            self._capas_base[estilo] = self._renderizar_capa(dibujar)
+        return self._capas_base[estilo]
+
+    def _componer(self, estilo, dibujar_superposicion):
+        base = self._capa_base(estilo)
+        if dibujar_superposicion is None:
+            imagen = base
+        else:
+            capa = self._renderizar_capa(dibujar_superposicion, transparente=True).astype(np.float32) / 255
+            alfa = capa[..., 3:]
+            imagen = base.astype(np.float32) / 255
+            imagen[..., :3] = capa[..., :3] * alfa + imagen[..., :3] * (1 - alfa)
+            imagen = (imagen * 255).round().astype(np.uint8)
+        buf = BytesIO()
+        mpimg.imsave(buf, imagen, format="png")
+        return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+    def _imagen_en_cache(self, clave, generar):
+        """Memoiza imágenes por (tipo, ruta/resaltado) con desalojo LRU"""
+        if clave in self._imagenes:
+            self._imagenes.move_to_end(clave)
+            return self._imagenes[clave]
+        imagen = generar()
+        self._imagenes[clave] = imagen
+        if len(self._imagenes) > MAX_IMAGENES_CACHE:
+            self._imagenes.popitem(last=False)
+        return imagen
+
+    def _renderizar_en_segundo_plano(self, clave, generar):
+        # Un solo hilo de dibujo: las peticiones se atienden en orden y solo se
+        # muestra la última (si el usuario ya pidió otra, la anterior se descarta).
+        # Se llama desde varios hilos de red a la vez, de ahí el candado.
+        with self._bloqueo_render:
+            self._solicitud_render += 1
+            solicitud = self._solicitud_render
+
+        def tarea():
+            try:
+                imagen = self._imagen_en_cache(clave, generar)
+            except Exception as e:
+                print(f"Error dibujando el grafo: {str(e)}")
+                return
+            if solicitud == self._solicitud_render:
+                self.mostrar_grafo_en_ui(imagen)
+
+        self._dibujante.submit(tarea)
+
     def dibujar_grafo_con_ruta(self, camino=None):
         if not self.grafo_completo:
             self.mostrar_mensaje("Grafo no disponible", "red")
             return
 
-        plt.figure(figsize=(20, 16))
-        plt.clf()
-        pos = self._get_node_positions()
-          #modificar aqui
-        nx.draw_networkx_nodes(self.grafo_completo, pos, node_size=3500, node_color="lightgreen", alpha=0.9, edgecolors="blue", linewidths=1)
-        nx.draw_networkx_labels(self.grafo_completo, pos, font_size=12, font_weight="bold", font_color="black", bbox=dict(alpha=0))
-        nx.draw_networkx_edges(self.grafo_completo, pos, edge_color="gray", arrows=True, arrowstyle="->", arrowsize=10, width=1.0, alpha=0.5)
-
-        edge_labels = {}
-        for edge in self.grafo_completo.edges():
-            if abs(pos[edge[0]][0] - pos[edge[1]][0]) < 0.5 and abs(pos[edge[0]][1] - pos[edge[1]][1]) < 0.5:
-                edge_labels[edge] = self.grafo_completo.edges[edge]['weight']
-        nx.draw_networkx_edge_labels(self.grafo_completo, pos, edge_labels=edge_labels, font_size=7, label_pos=0.5, bbox=dict(facecolor="white", alpha=0.6, edgecolor="none"))
-
+        grafo = self.grafo_completo
+        dibujar = None
         if camino and len(camino) > 1:
             edges = [(camino[i], camino[i+1]) for i in range(len(camino)-1)]
-            nx.draw_networkx_nodes(self.grafo_completo, pos, nodelist=camino, node_size=1500, node_color="lightgreen", edgecolors="darkblue", linewidths=2)
-            nx.draw_networkx_edges(self.grafo_completo, pos, edgelist=edges, edge_color="red", width=2.5, arrows=True, arrowstyle="->", arrowsize=15)
 
-        plt.xlim(-0.1, 1.1)
-        plt.ylim(-0.1, 1.4)
-        plt.axis('off')
-        plt.tight_layout()
-        self.mostrar_grafo_en_ui()
+            def dibujar(ax, pos):
+                nx.draw_networkx_nodes(grafo, pos, ax=ax, nodelist=camino, node_size=1500, node_color="lightgreen", edgecolors="darkblue", linewidths=2)
+                nx.draw_networkx_edges(grafo, pos, ax=ax, edgelist=edges, edge_color="red", width=2.5, arrows=True, arrowstyle="->", arrowsize=15)
+
+        clave = ("ruta", tuple(camino) if camino and len(camino) > 1 else None)
+        self._renderizar_en_segundo_plano(clave, lambda: self._componer("ruta", dibujar))
 
     def dibujar_grafo_completo(self, resaltar_origen=None, resaltar_destino=None):
         if not self.grafo_completo:
             return
 
-        plt.figure(figsize=(20, 16))
-        plt.clf()
-        pos = self._get_node_positions()
-
-        node_colors = []
-        for n in self.grafo_completo.nodes():
-            if n == resaltar_origen:
-                node_colors.append("green")
-            elif n == resaltar_destino:
-                node_colors.append("red")
-            else:
-                node_colors.append("lightgreen")
-              #modificacion aqui
-        nx.draw_networkx_nodes(self.grafo_completo, pos, node_size=3500, node_color=node_colors, alpha=0.9, edgecolors="blue", linewidths=1)
-        nx.draw_networkx_labels(self.grafo_completo, pos, font_size=12, font_weight="bold", font_color="black", bbox=dict(alpha=0))
-
-        visible_edges = []
-        for edge in self.grafo_completo.edges():
-            if abs(pos[edge[0]][0] - pos[edge[1]][0]) < 0.5 and abs(pos[edge[0]][1] - pos[edge[1]][1]) < 0.5:
-                visible_edges.append(edge)
-
-        nx.draw_networkx_edges(self.grafo_completo, pos, edgelist=visible_edges, edge_color="gray", arrows=True, arrowstyle="->", arrowsize=10, width=1.5, alpha=0.7)
-
-        edge_labels = {}
-        for edge in visible_edges:
-            edge_labels[edge] = self.grafo_completo.edges[edge]['weight']
-        nx.draw_networkx_edge_labels(self.grafo_completo, pos, edge_labels=edge_labels, font_size=7, label_pos=0.5, bbox=dict(facecolor="white", alpha=0.6, edgecolor="none"))
-
-        plt.xlim(-0.1, 1.1)
-        plt.ylim(-0.1, 1.4)
-        plt.axis('off')
-        plt.tight_layout()
-        self.mostrar_grafo_en_ui()
-
-    def mostrar_grafo_en_ui(self):
-        buf = BytesIO()
-        plt.savefig(buf, format="png", dpi=100, bbox_inches="tight")
-        plt.close()
-        buf.seek(0)
-        self.img_grafo.src_base64 = base64.b64encode(buf.read()).decode("utf-8")
+        grafo = self.grafo_completo
+        resaltados = [(n, color) for n, color in ((resaltar_origen, "green"), (resaltar_destino, "red")) if n in grafo]
+        dibujar = None
+        if resaltados:
+            def dibujar(ax, pos):
+                #modificacion aqui
+                for n, color in resaltados:
+                    nx.draw_networkx_nodes(grafo, pos, ax=ax, nodelist=[n], node_size=3500, node_color=color, alpha=0.9, edgecolors="blue", linewidths=1)
+                nx.draw_networkx_labels(grafo, pos, ax=ax, labels={n: n for n, _ in resaltados}, font_size=12, font_weight="bold", font_color="black", bbox=dict(alpha=0))
+
+        clave = ("completo", resaltar_origen, resaltar_destino)
+        self._renderizar_en_segundo_plano(clave, lambda: self._componer("completo", dibujar))
+
+    def mostrar_grafo_en_ui(self, imagen_base64):
+        self.img_grafo.src_base64 = imagen_base64
         self.img_grafo.visible = True
         self.page.update()
 
@@ -0,0 +1,48 @@
+-- Coordenadas de los lugares para el modo A* de /api/camino-minimo
+-- (TABLA_COORDENADAS en API/API.py). Son las posiciones con que Cliente.py
+-- dibuja el mapa: las unidades dan igual porque la API escala la heurística
+-- con las propias distancias. Si falta la fila de algún lugar del grafo, A*
+-- no tiene heurística válida y el modo astar vuelve a Dijkstra.
+--
+--     mysql quetzaltenango_grafo < DatosBD/coordenadas_lugares.sql
+--
+-- Redes más grandes: DatosBD/ingesta.py llena la tabla desde GeoJSON o --coordenadas.
+
+CREATE TABLE IF NOT EXISTS coordenadas_lugares (
+    lugar VARCHAR(255) NOT NULL PRIMARY KEY,
+    x DOUBLE,
+    y DOUBLE
+);
+
+REPLACE INTO coordenadas_lugares (lugar, x, y) VALUES
+    ('DF la esperanza', 0.02, 0.84),
+    ('interplaza Xela', 0.13, 0.76),
+    ('Umg', 0.16, 0.84),
+    ('Col el Maestro', 0.19, 0.99),
+    ('hospital', 0.34, 0.79),
+    ('suma', 0.31, 0.97),
+    ('parque la floresta', 0.39, 0.61),
+    ('seminario san jose', 0.32, 0.53),
+    ('paseo luna', 0.21, 1.15),
+    ('salon comunal', 0.27, 1.26),
+    ('Xelapan los trigales', 0.53, 1.10),
+    ('Monumento a Tecun uman', 0.53, 0.95),
+    ('pradera xela', 0.43, 0.53),
+    ('Xelapan los altos', 0.55, 0.59),
+    ('CUNOC-USAC', 0.43, 0.40),
+    ('Complejo deportivo', 0.49, 0.46),
+    ('Iglesia el Calvario', 0.53, 0.29),
+    ('Hospital Rodolfo Robles', 0.50, 0.18),
+    ('La Cantera Sport Club', 0.46, 0.00),
+    ('Utz Ulew Mall', 0.57, 0.40),
+    ('benito juares', 0.65, 0.42),
+    ('Estadio Mario Camposeco', 0.71, 0.37),
+    ('Centro de atencion Permanente quetzaltenango', 0.76, 0.52),
+    ('Col El Rosario', 0.81, 0.65),
+    ('col san antonio', 0.76, 0.85),
+    ('Parque a Centroamerica', 0.84, 0.34),
+    ('plaza 7', 0.89, 0.24),
+    ('IGSS Quetzaltenango', 1.00, 0.37),
+    ('Monumento a la Marimba', 0.93, 0.41),
+    ('Parque Colonia Molina', 0.97, 0.31),
+    ('VFH6+H74 Aldea Justo Rufino Barrios', 0.10, 0.60);
@@ -1,51 +1,309 @@
-import requests
+import argparse
+import csv
+import io
 import json
+import os
+import sys
+import time
+
+import requests
 from tabulate import tabulate  # Instalar con: pip install tabulate
 
+try:
+    import pyarrow as pa  # Opcional: solo para exportar en Parquet
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+API_URL = "http://localhost:5000/api/conexiones"
+
+# Filas por página: cada página es una petición y un punto de reanudación
+FILAS_POR_PAGINA = 50000
+# (conexión, lectura) en segundos; la de lectura cuenta entre trozos
+# recibidos, no para la respuesta entera
+TIMEOUT = (5, 60)
+# Reintentos de una página cortada a medias (se retoma desde la última completa)
+REINTENTOS = 3
+
+FORMATOS = ('ndjson', 'json', 'csv', 'parquet')
+COLUMNAS = ["origen", "destino", "distancia_km", "adyacente"]
+
+class VersionCambiada(Exception):
+    """El grafo de la API cambió entre páginas: los offsets ya no valen"""
+
+class _EscritorTexto:
+    """NDJSON, JSON o CSV en un solo archivo.
+
+    La posición de reanudación es el tamaño en bytes al terminar la última
+    página completa: al reanudar se trunca ahí lo que quedó a medias.
+    """
+
+    def __init__(self, ruta, formato, posicion):
+        self.formato = formato
+        self.f = open(ruta, 'r+b' if posicion else 'wb')
+        self.f.truncate(posicion)
+        self.f.seek(posicion)
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer)
+        if posicion == 0:
+            if formato == 'json':
+                self.f.write(b'[')
+            elif formato == 'csv':
+                self._csv.writerow(COLUMNAS)
+                self._volcar()
+        # En JSON, la primera fila va sin coma delante
+        self._primera = formato == 'json' and self.f.tell() <= 1
+
+    @staticmethod
+    def reanudable(ruta, posicion):
+        """El archivo sigue ahí y llega al menos hasta la posición guardada"""
+        return os.path.isfile(ruta) and os.path.getsize(ruta) >= posicion
+
+    def _volcar(self):
+        self.f.write(self._buffer.getvalue().encode('utf-8'))
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+    def escribir(self, linea):
+        if self.formato == 'ndjson':
+            self.f.write(linea + b'\n')
+        elif self.formato == 'json':
+            self.f.write(linea if self._primera else b',\n' + linea)
+            self._primera = False
+        else:
+            fila = json.loads(linea)
+            self._csv.writerow([fila[columna] for columna in COLUMNAS])
+            self._volcar()
+
+    def punto(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.tell()
+
+    def terminar(self):
+        if self.formato == 'json':
+            self.f.write(b']\n')
+        self.f.flush()
+
+    def cerrar(self):
+        self.f.close()
+
+class _EscritorParquet:
+    """Un archivo parte-NNNNN.parquet por página dentro del directorio destino.
+
+    La posición de reanudación es el número de partes completas; cada parte
+    se escribe en un temporal y se renombra, así que nunca queda a medias.
+    Se lee entera con pyarrow.parquet.read_table(destino) o pandas.read_parquet.
+    """
+
+    ESQUEMA = None if pa is None else pa.schema([
+        ("origen", pa.string()), ("destino", pa.string()),
+        ("distancia_km", pa.float64()), ("adyacente", pa.int8()),
+    ])
+
+    def __init__(self, ruta, formato, posicion):
+        self.ruta = ruta
+        self.partes = posicion
+        os.makedirs(ruta, exist_ok=True)
+        for nombre in os.listdir(ruta):
+            # Partes de un intento anterior más allá del punto de reanudación
+            if nombre.startswith('parte-') and int(nombre[6:11]) >= posicion:
+                os.remove(os.path.join(ruta, nombre))
+        self._columnas = {columna: [] for columna in COLUMNAS}
+
+    @staticmethod
+    def reanudable(ruta, posicion):
+        """Siguen ahí todas las partes anteriores a la posición guardada"""
+        return all(os.path.isfile(os.path.join(ruta, f"parte-{parte:05d}.parquet"))
+                   for parte in range(posicion))
+
+    def escribir(self, linea):
+        fila = json.loads(linea)
+        for columna, valores in self._columnas.items():
+            valores.append(fila[columna])
+
+    def punto(self):
+        if self._columnas["origen"]:
+            tabla = pa.table(self._columnas, schema=self.ESQUEMA)
+            final = os.path.join(self.ruta, f"parte-{self.partes:05d}.parquet")
+            pq.write_table(tabla, final + ".tmp")
+            os.replace(final + ".tmp", final)
+            self.partes += 1
+            self._columnas = {columna: [] for columna in COLUMNAS}
+        return self.partes
+
+    def terminar(self):
+        pass
+
+    def cerrar(self):
+        pass
+
+def _leer_progreso(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _guardar_progreso(ruta, progreso):
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(progreso, f, indent=2)
+    os.replace(ruta + '.tmp', ruta)
+
+def _exportar(sesion, destino, formato, url, pagina, solo_adyacentes, reanudar, timeout):
+    ruta_progreso = destino.rstrip(os.sep) + '.progreso.json'
+    progreso = _leer_progreso(ruta_progreso) if reanudar else None
+    clase = _EscritorParquet if formato == 'parquet' else _EscritorTexto
+    if progreso is not None and (progreso.get('formato'), progreso.get('url'),
+                                 progreso.get('solo_adyacentes')) != (formato, url, solo_adyacentes):
+        progreso = None
+    if progreso is not None and not clase.reanudable(destino, progreso['posicion']):
+        # La salida se borró o se recortó después de guardar el progreso:
+        # reanudar dejaría un hueco (o ceros al truncar hacia arriba)
+        print(f"⚠️ {destino} no coincide con el progreso guardado; empezando de cero")
+        progreso = None
+    if progreso is None:
+        progreso = {"formato": formato, "url": url, "solo_adyacentes": solo_adyacentes,
+                    "version": None, "offset": 0, "posicion": 0, "total": None}
+    elif progreso['offset']:
+        print(f"Reanudando {destino} desde la fila {progreso['offset']}")
+
+    escritor = clase(destino, formato, progreso['posicion'])
+    try:
+        while True:
+            parametros = {'formato': 'ndjson', 'offset': progreso['offset'], 'limit': pagina}
+            if solo_adyacentes:
+                parametros['solo_adyacentes'] = '1'
+            filas = 0
+            with sesion.get(url, params=parametros, stream=True, timeout=timeout) as respuesta:
+                respuesta.raise_for_status()
+                version = respuesta.headers.get('X-Version-Grafo')
+                if progreso['version'] is not None and version != progreso['version']:
+                    raise VersionCambiada(f"{progreso['version']} -> {version}")
+                for linea in respuesta.iter_lines(chunk_size=64 * 1024):
+                    if linea:
+                        escritor.escribir(linea)
+                        filas += 1
+                total = int(respuesta.headers.get('X-Total-Count', progreso['offset'] + filas))
+
+            progreso.update(version=version, total=total, offset=progreso['offset'] + filas,
+                            posicion=escritor.punto())
+            _guardar_progreso(ruta_progreso, progreso)
+            print(f"  {progreso['offset']}/{total} filas", file=sys.stderr)
+            if filas < pagina or progreso['offset'] >= total:
+                break
+
+        escritor.terminar()
+        # Terminada no hay nada que reanudar: la próxima vez se exporta de cero
+        os.remove(ruta_progreso)
+        return progreso['offset']
+    finally:
+        escritor.cerrar()
+
+def exportar(destino, formato='ndjson', url=API_URL, pagina=FILAS_POR_PAGINA,
+             solo_adyacentes=False, reanudar=True, timeout=TIMEOUT, reintentos=REINTENTOS):
+    """Exporta /api/conexiones a destino por páginas, con memoria constante.
+
+    Cada página se pide como NDJSON con stream=True y sus líneas se escriben
+    en disco a medida que llegan. Tras cada página completa se guarda
+    <destino>.progreso.json; si la exportación se corta, la siguiente llamada
+    (o el reintento automático) sigue desde ahí. Si el grafo cambia de
+    versión entre páginas, la exportación empieza de nuevo.
+
+    formato: ndjson, json (un arreglo), csv o parquet (requiere pyarrow; destino
+    es un directorio con una parte por página). Devuelve las filas exportadas.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato} (use {', '.join(FORMATOS)})")
+    if formato == 'parquet' and pq is None:
+        raise RuntimeError("Exportar en Parquet requiere pyarrow (pip install pyarrow)")
+
+    with requests.Session() as sesion:
+        intento = 0
+        while True:
+            try:
+                return _exportar(sesion, destino, formato, url, pagina, solo_adyacentes,
+                                 reanudar, timeout)
+            except VersionCambiada as e:
+                if intento >= reintentos:
+                    raise
+                print(f"\n🔄 El grafo cambió durante la exportación ({e}); empezando de nuevo")
+                reanudar = False
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                if intento >= reintentos:
+                    raise
+                print(f"\n⚠️ Página interrumpida ({e.__class__.__name__}); reintentando")
+                reanudar = True
+                time.sleep(2 ** intento)
+            intento += 1
+
 def test_api():
     """Función para probar la conexión con la API"""
-    api_url = "http://localhost:5000/api/conexiones"
-    
+    api_url = API_URL
+
     try:
         print("🔍 Intentando conectar con la API...")
-        response = requests.get(api_url, timeout=5)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
+        with requests.get(api_url, params={'formato': 'ndjson', 'limit': 5},
+                          stream=True, timeout=TIMEOUT) as response:
+            if response.status_code == 200:
+                primeros = [json.loads(linea) for linea in response.iter_lines() if linea]
+                total = response.headers.get('X-Total-Count', '?')
+            else:
+                primeros = None
+                error = response.text
+
+        if primeros is not None:
             print("\n✅ Conexión exitosa!")
-            print(f"📊 Total de registros: {data['count']}")
-            
+            print(f"📊 Total de registros: {total}")
+
             # Mostrar tabla con los primeros 5 registros
             headers = ["Origen", "Destino", "Distancia (km)", "Adyacente"]
             table_data = [
-                [item['origen'], item['destino'], item['distancia_km'], item['adyacente']] 
-                for item in data['data'][:5]
+                [item['origen'], item['destino'], item['distancia_km'], item['adyacente']]
+                for item in primeros
             ]
-            
+
             print("\n📋 Primeros 5 registros:")
             print(tabulate(table_data, headers=headers, tablefmt="grid"))
-            
-            # Guardar datos completos en JSON
-            with open('datos_conexiones.json', 'w', encoding='utf-8') as f:
-                json.dump(data['data'], f, indent=2, ensure_ascii=False)
+
+            # Guardar datos completos en JSON, por páginas y sin cargarlos en memoria
+            exportar('datos_conexiones.json', formato='json', url=api_url)
             print("\n💾 Datos guardados en 'datos_conexiones.json'")
-            
+
         else:
             print(f"\n❌ Error en la API (Código {response.status_code}):")
-            print(response.text)
-            
+            print(error)
+
     except requests.exceptions.ConnectionError:
         print("\n❌ No se pudo conectar al servidor. Verifica que:")
         print("- La API esté corriendo (ejecuta API.py primero)")
         print("- El puerto coincida (5000)")
         print("- No haya errores en la terminal donde corre la API")
-        
+
     except requests.exceptions.Timeout:
         print("\n⌛ Tiempo de espera agotado")
-        
+
     except Exception as e:
         print(f"\n⚠️ Error inesperado: {str(e)}")
 
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Exporta /api/conexiones por páginas y de forma reanudable")
+    parser.add_argument("destino", help="archivo (o directorio, en Parquet) de salida")
+    parser.add_argument("--formato", choices=FORMATOS, default="ndjson")
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--pagina", type=int, default=FILAS_POR_PAGINA, help="filas por petición")
+    parser.add_argument("--solo-adyacentes", action="store_true")
+    parser.add_argument("--sin-reanudar", action="store_true",
+                        help="ignorar el progreso guardado y empezar de cero")
+    args = parser.parse_args(argumentos)
+    filas = exportar(args.destino, args.formato, args.url, args.pagina, args.solo_adyacentes,
+                     reanudar=not args.sin_reanudar)
+    print(f"\n💾 {filas} conexiones guardadas en '{args.destino}'")
+
 if __name__ == "__main__":
-    test_api()
\ No newline at end of file
+    # Sin argumentos, la prueba de siempre; con destino, solo la exportación
+    if len(sys.argv) > 1:
+        main()
+    else:
+        test_api()
@@ -0,0 +1,523 @@
+"""Ingesta masiva de aristas en distancias_adyacencia.
+
+Lee archivos de aristas grandes por tramos (CSV o GeoJSON, p. ej. un
+extracto de OpenStreetMap exportado con osmnx u ogr2ogr), valida y quita
+repetidas cada fila y carga el resultado en MySQL con executemany por lotes
+o LOAD DATA LOCAL INFILE. También puede escribir directamente la instantánea
+binaria que abre la API (GRAFO_SNAPSHOT), sin pasar por la base:
+
+    python ingesta.py calles.csv --modo reemplazar
+    python ingesta.py calles.geojson --snapshot ../API/instantanea --sin-bd
+    python ingesta.py calles.csv --coordenadas nodos.csv --sqlite prueba.db
+
+Las aristas aceptadas se guardan en arreglos NumPy con los lugares
+convertidos a índices, así que la memoria no depende de listas de tuplas:
+una red de cientos de miles de aristas se carga en pocos minutos.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import ijson  # Opcional: lee una FeatureCollection sin cargarla entera
+except ImportError:
+    ijson = None
+
+# grafo.py y la configuración (base, tablas y límites de la instantánea) viven
+# junto a la API; se importan desde ahí para no copiarlos
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'API'))
+from configuracion import (DB_CONFIG, LIMITE_CIERRE, LIMITE_TABLA_RUTAS,  # noqa: E402
+                           TABLA_ARISTAS, TABLA_COORDENADAS)
+from grafo import Grafo, arreglo_coordenadas, guardar_snapshot, sin_repetidas  # noqa: E402
+
+# Filas por tramo de lectura y por executemany
+TAMANO_LOTE = 10000
+
+RADIO_TIERRA_KM = 6371.0088
+
+_ESQUEMAS = {
+    'mysql': (
+        f"CREATE TABLE IF NOT EXISTS {TABLA_ARISTAS} ("
+        "origen VARCHAR(255) NOT NULL, destino VARCHAR(255) NOT NULL, "
+        "distancia_km DOUBLE NOT NULL, adyacente TINYINT NOT NULL, "
+        "INDEX (origen, destino))",
+        f"CREATE TABLE IF NOT EXISTS {TABLA_COORDENADAS} ("
+        "lugar VARCHAR(255) NOT NULL PRIMARY KEY, x DOUBLE, y DOUBLE)",
+    ),
+    'sqlite': (
+        f"CREATE TABLE IF NOT EXISTS {TABLA_ARISTAS} ("
+        "origen TEXT, destino TEXT, distancia_km REAL, adyacente INTEGER)",
+        f"CREATE TABLE IF NOT EXISTS {TABLA_COORDENADAS} (lugar TEXT, x REAL, y REAL)",
+    ),
+}
+
+# --------------------------------------------------
+# Lectura
+# --------------------------------------------------
+#
+# Los lectores devuelven tuplas sin validar
+# (origen, destino, distancia_km, adyacente, doble_sentido, inicio, fin),
+# con inicio y fin = coordenadas (x, y) de los extremos o None.
+
+def leer_csv(ruta, separador=',', doble_sentido=False):
+    """Aristas de un CSV con encabezado origen, destino, distancia_km[, adyacente]"""
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        lector = csv.reader(f, delimiter=separador)
+        encabezado = [columna.strip().lower() for columna in next(lector, [])]
+        faltan = {'origen', 'destino', 'distancia_km'} - set(encabezado)
+        if faltan:
+            raise ValueError(f"Faltan columnas en {ruta}: {', '.join(sorted(faltan))}")
+        io, idd, ikm = (encabezado.index(c) for c in ('origen', 'destino', 'distancia_km'))
+        iady = encabezado.index('adyacente') if 'adyacente' in encabezado else None
+        for fila in lector:
+            if not fila:
+                continue
+            try:
+                yield (fila[io], fila[idd], fila[ikm], 1 if iady is None else fila[iady],
+                       doble_sentido, None, None)
+            except IndexError:
+                yield (None, None, None, None, False, None, None)
+
+def _features(f):
+    """Features de una FeatureCollection o de GeoJSON por líneas (una por línea)"""
+    primera = f.readline()
+    try:
+        objeto = json.loads(primera.lstrip('\x1e'))
+    except ValueError:
+        objeto = None
+    if isinstance(objeto, dict) and objeto.get('type') == 'Feature':
+        # GeoJSONSeq (RFC 8142) o NDJSON: se lee siempre por líneas
+        yield objeto
+        for linea in f:
+            linea = linea.strip().lstrip('\x1e')
+            if linea:
+                yield json.loads(linea)
+        return
+
+    f.seek(0)
+    if ijson is not None:
+        yield from ijson.items(f.buffer, 'features.item', use_float=True)
+    else:
+        # Sin ijson una FeatureCollection se lee entera
+        print("Aviso: sin ijson la FeatureCollection se carga completa en memoria",
+              file=sys.stderr)
+        yield from json.load(f).get('features', [])
+
+def _extremos(geometria):
+    if not geometria:
+        return None, None
+    coordenadas = geometria.get('coordinates') or []
+    if geometria.get('type') == 'MultiLineString':
+        coordenadas = [punto for linea in coordenadas for punto in linea]
+    elif geometria.get('type') != 'LineString':
+        return None, None
+    if len(coordenadas) < 2:
+        return None, None
+    return coordenadas, (coordenadas[0][:2], coordenadas[-1][:2])
+
+def longitud_km(coordenadas):
+    """Largo de una polilínea de (lon, lat) en km (haversine)"""
+    puntos = np.radians(np.asarray(coordenadas, dtype=float)[:, :2])
+    dlon = np.diff(puntos[:, 0])
+    dlat = np.diff(puntos[:, 1])
+    a = np.sin(dlat / 2) ** 2 + np.cos(puntos[:-1, 1]) * np.cos(puntos[1:, 1]) * np.sin(dlon / 2) ** 2
+    return float(2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(a)).sum())
+
+def _primero(propiedades, *claves):
+    for clave in claves:
+        if propiedades.get(clave) is not None:
+            return propiedades[clave]
+    return None
+
+def leer_geojson(ruta, doble_sentido=True):
+    """Aristas de las LineString de un GeoJSON.
+
+    Los extremos salen de origen/destino, u/v (osmnx) o from/to. La
+    distancia, de distancia_km, de length (metros, osmnx) o del largo de la
+    geometría en (lon, lat). oneway sigue a OSM: 'yes'/true es un solo
+    sentido, '-1' el sentido contrario y, si falta, doble_sentido decide.
+    """
+    with open(ruta, encoding='utf-8') as f:
+        for feature in _features(f):
+            propiedades = feature.get('properties') or {}
+            puntos, extremos = _extremos(feature.get('geometry'))
+            if puntos is None and (feature.get('geometry') or {}).get('type') == 'Point':
+                continue  # Nodos sueltos: las coordenadas salen de los extremos de las calles
+            origen = _primero(propiedades, 'origen', 'u', 'from')
+            destino = _primero(propiedades, 'destino', 'v', 'to')
+            distancia = _primero(propiedades, 'distancia_km')
+            if distancia is None and propiedades.get('length') is not None:
+                try:
+                    distancia = float(propiedades['length']) / 1000
+                except (TypeError, ValueError):
+                    distancia = propiedades['length']
+            if distancia is None and puntos is not None:
+                distancia = longitud_km(puntos)
+            inicio, fin = extremos or (None, None)
+
+            sentido = str(propiedades.get('oneway', '')).strip().lower()
+            doble = doble_sentido if sentido in ('', 'none') else \
+                sentido not in ('yes', 'true', '1', '-1')
+            if sentido == '-1':
+                origen, destino, inicio, fin = destino, origen, fin, inicio
+            yield (None if origen is None else str(origen), None if destino is None else str(destino),
+                   distancia, _primero(propiedades, 'adyacente') if 'adyacente' in propiedades else 1,
+                   doble, inicio, fin)
+
+def leer_coordenadas_csv(ruta, separador=','):
+    """(lugar, x, y) de un CSV con encabezado lugar, x, y"""
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        for fila in csv.DictReader(f, delimiter=separador):
+            yield fila.get('lugar'), fila.get('x'), fila.get('y')
+
+def por_tramos(iterable, tamano):
+    tramo = []
+    for elemento in iterable:
+        tramo.append(elemento)
+        if len(tramo) >= tamano:
+            yield tramo
+            tramo = []
+    if tramo:
+        yield tramo
+
+# --------------------------------------------------
+# Validación y acumulación
+# --------------------------------------------------
+
+def validar(origen, destino, distancia, adyacente):
+    """Fila normalizada (origen, destino, distancia_km, adyacente) o ValueError con el motivo"""
+    if origen is None or destino is None:
+        raise ValueError("faltan origen o destino")
+    origen, destino = str(origen).strip(), str(destino).strip()
+    if not origen or not destino:
+        raise ValueError("origen o destino vacío")
+    if any(c in lugar for lugar in (origen, destino) for c in '\t\r\n'):
+        raise ValueError("nombre de lugar con tabuladores o saltos de línea")
+    try:
+        distancia = float(distancia)
+    except (TypeError, ValueError):
+        raise ValueError(f"distancia no numérica: {distancia!r}") from None
+    if not math.isfinite(distancia) or distancia < 0:
+        raise ValueError(f"distancia fuera de rango: {distancia}")
+
+    texto = str(adyacente).strip().lower()
+    if texto in ('1', 'true', 'si', 'sí', 'yes'):
+        adyacente = 1
+    elif texto in ('0', 'false', 'no'):
+        adyacente = 0
+    else:
+        raise ValueError(f"adyacente debe ser 0 o 1: {adyacente!r}")
+    if origen == destino and adyacente:
+        raise ValueError("arista adyacente de un lugar a sí mismo")
+    return origen, destino, distancia, adyacente
+
+class Acumulador:
+    """Aristas validadas en arreglos NumPy por tramo, con los lugares como índices"""
+
+    def __init__(self):
+        self.lugares = []
+        self.indice = {}
+        self.coordenadas = {}
+        self._tramos = []
+
+    def id_lugar(self, lugar):
+        i = self.indice.get(lugar)
+        if i is None:
+            i = self.indice[lugar] = len(self.lugares)
+            self.lugares.append(lugar)
+        return i
+
+    def agregar(self, filas):
+        """filas: lista acotada de tuplas validadas (origen, destino, distancia_km, adyacente)"""
+        if not filas:
+            return
+        origenes, destinos, distancias, adyacentes = zip(*filas)
+        self._tramos.append((
+            np.fromiter(map(self.id_lugar, origenes), dtype=np.int64, count=len(filas)),
+            np.fromiter(map(self.id_lugar, destinos), dtype=np.int64, count=len(filas)),
+            np.asarray(distancias, dtype=float),
+            np.asarray(adyacentes, dtype=np.int8),
+        ))
+
+    def agregar_coordenada(self, lugar, punto):
+        # La primera coordenada de cada lugar gana
+        if punto is not None and lugar not in self.coordenadas:
+            self.coordenadas[lugar] = (float(punto[0]), float(punto[1]))
+
+    def columnas(self):
+        """(lugares ordenados, (origenes, destinos, distancias, adyacentes), repetidas).
+
+        De cada par (origen, destino) queda la última fila leída, y cada lugar
+        recibe su fila consigo mismo (0 km, no adyacente) como en la tabla
+        original, para que SELECT DISTINCT origen lo encuentre.
+        """
+        n = len(self.lugares)
+        # Los índices pasan al orden alfabético, el mismo de cargar_datos
+        orden = sorted(range(n), key=self.lugares.__getitem__)
+        rango = np.empty(n, dtype=np.int64)
+        rango[orden] = np.arange(n)
+        lugares = [self.lugares[i] for i in orden]
+
+        if self._tramos:
+            origenes, destinos, distancias, adyacentes = (
+                np.concatenate(columna) for columna in zip(*self._tramos))
+            origenes, destinos = rango[origenes], rango[destinos]
+        else:
+            origenes = destinos = np.zeros(0, dtype=np.int64)
+            distancias, adyacentes = np.zeros(0), np.zeros(0, dtype=np.int8)
+        self._tramos = []
+
+        leidas = len(origenes)
+        origenes, destinos, distancias, adyacentes = sin_repetidas(
+            n, origenes, destinos, distancias, adyacentes)
+        repetidas = leidas - len(origenes)
+
+        # Las filas propias van delante: si el archivo trae la de un lugar
+        # consigo mismo, gana la del archivo
+        propios = np.arange(n, dtype=np.int64)
+        columnas = sin_repetidas(n, np.concatenate([propios, origenes]),
+                                 np.concatenate([propios, destinos]),
+                                 np.concatenate([np.zeros(n), distancias]),
+                                 np.concatenate([np.zeros(n, dtype=np.int8), adyacentes]))
+        return lugares, columnas, repetidas
+
+def ingerir(filas, lote=TAMANO_LOTE, rechazos=None):
+    """Valida las filas de un lector por tramos; devuelve (Acumulador, leidas, rechazadas).
+
+    rechazos, si se da, es un csv.writer que recibe cada fila descartada con
+    su motivo.
+    """
+    acumulador = Acumulador()
+    leidas = rechazadas = 0
+    inicio = time.perf_counter()
+    for tramo in por_tramos(filas, lote):
+        validas = []
+        for origen, destino, distancia, adyacente, doble, punto_inicio, punto_fin in tramo:
+            leidas += 1
+            try:
+                fila = validar(origen, destino, distancia, adyacente)
+            except ValueError as e:
+                rechazadas += 1
+                if rechazos is not None:
+                    rechazos.writerow([leidas, origen, destino, distancia, adyacente, str(e)])
+                continue
+            validas.append(fila)
+            if doble and fila[0] != fila[1]:
+                validas.append((fila[1], fila[0], fila[2], fila[3]))
+            acumulador.agregar_coordenada(fila[0], punto_inicio)
+            acumulador.agregar_coordenada(fila[1], punto_fin)
+        acumulador.agregar(validas)
+        print(f"  {leidas} filas leídas ({leidas / (time.perf_counter() - inicio):.0f}/s)",
+              file=sys.stderr)
+    return acumulador, leidas, rechazadas
+
+# --------------------------------------------------
+# Carga en la base
+# --------------------------------------------------
+
+def conectar(sqlite=None, config=None, load_data=False):
+    """(conexión, motor): MySQL con DB_CONFIG o un archivo SQLite"""
+    if sqlite:
+        return sqlite3.connect(sqlite), 'sqlite'
+    import mysql.connector
+    return mysql.connector.connect(autocommit=False, allow_local_infile=load_data,
+                                   **(config or DB_CONFIG)), 'mysql'
+
+def _filas_nombradas(lugares, columnas, inicio, fin):
+    origenes, destinos, distancias, adyacentes = (c[inicio:fin].tolist() for c in columnas)
+    return list(zip(map(lugares.__getitem__, origenes), map(lugares.__getitem__, destinos),
+                    distancias, adyacentes))
+
+def _cargar_load_data(cursor, lugares, columnas, lote):
+    """Escribe un TSV temporal por tramos y lo carga con LOAD DATA LOCAL INFILE"""
+    descriptor, ruta = tempfile.mkstemp(prefix='aristas_', suffix='.tsv')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8', newline='') as f:
+            for inicio in range(0, len(columnas[0]), lote):
+                f.writelines(
+                    '%s\t%s\t%r\t%d\n' % (o.replace('\\', '\\\\'), d.replace('\\', '\\\\'), km, a)
+                    for o, d, km, a in _filas_nombradas(lugares, columnas, inicio, inicio + lote))
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {TABLA_ARISTAS} CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+            "(origen, destino, distancia_km, adyacente)", (ruta,))
+    finally:
+        os.remove(ruta)
+
+def cargar_base(conn, motor, lugares, columnas, coordenadas=None, modo='reemplazar',
+                lote=TAMANO_LOTE, load_data=False):
+    """Escribe las aristas (y coordenadas) en una sola transacción.
+
+    modo reemplazar vacía la tabla antes de insertar; modo anadir reemplaza
+    solo los pares (origen, destino) presentes en la entrada. Hasta el
+    commit, la API sigue leyendo los datos anteriores.
+    """
+    marcador = '?' if motor == 'sqlite' else '%s'
+    cursor = conn.cursor()
+    try:
+        for sentencia in _ESQUEMAS[motor]:
+            cursor.execute(sentencia)
+        if motor == 'mysql':
+            cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
+
+        total = len(columnas[0])
+        if modo == 'reemplazar':
+            cursor.execute(f"DELETE FROM {TABLA_ARISTAS}")
+        else:
+            for inicio in range(0, total, lote):
+                cursor.executemany(
+                    f"DELETE FROM {TABLA_ARISTAS} WHERE origen = {marcador} AND destino = {marcador}",
+                    [fila[:2] for fila in _filas_nombradas(lugares, columnas, inicio, inicio + lote)])
+
+        if load_data and motor == 'mysql':
+            _cargar_load_data(cursor, lugares, columnas, lote)
+        else:
+            insercion = (f"INSERT INTO {TABLA_ARISTAS} (origen, destino, distancia_km, adyacente) "
+                         f"VALUES ({marcador}, {marcador}, {marcador}, {marcador})")
+            for inicio in range(0, total, lote):
+                cursor.executemany(insercion, _filas_nombradas(lugares, columnas, inicio, inicio + lote))
+                print(f"  {min(total, inicio + lote)}/{total} filas insertadas", file=sys.stderr)
+
+        if coordenadas:
+            filas = [(lugar, x, y) for lugar, (x, y) in coordenadas.items()]
+            if modo == 'reemplazar':
+                cursor.execute(f"DELETE FROM {TABLA_COORDENADAS}")
+            for inicio in range(0, len(filas), lote):
+                tramo = filas[inicio:inicio + lote]
+                if modo != 'reemplazar':
+                    cursor.executemany(f"DELETE FROM {TABLA_COORDENADAS} WHERE lugar = {marcador}",
+                                       [(fila[0],) for fila in tramo])
+                cursor.executemany(f"INSERT INTO {TABLA_COORDENADAS} (lugar, x, y) "
+                                   f"VALUES ({marcador}, {marcador}, {marcador})", tramo)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# --------------------------------------------------
+# Instantánea
+# --------------------------------------------------
+
+def escribir_snapshot(ruta, lugares, columnas, coordenadas=None, incluir_tablas=True,
+                      limite_tabla=LIMITE_TABLA_RUTAS, limite_cierre=LIMITE_CIERRE):
+    """Construye el Grafo a partir de las columnas y lo guarda como instantánea.
+
+    La versión continúa la de la instantánea que hubiera en ruta, para que
+    los procesos que la tienen abierta detecten el cambio al recargar.
+    """
+    version = 1
+    try:
+        with open(os.path.join(ruta, 'manifiesto.json'), encoding='utf-8') as f:
+            version = json.load(f)['version'] + 1
+    except (OSError, ValueError, KeyError):
+        pass
+
+    arreglo = None
+    if coordenadas:
+        arreglo = arreglo_coordenadas({lugar: i for i, lugar in enumerate(lugares)}, coordenadas)
+    grafo = Grafo(lugares, *columnas, version=version, limite_tabla=limite_tabla,
+                  limite_cierre=limite_cierre, coordenadas=arreglo)
+    return guardar_snapshot(grafo, ruta, incluir_tablas=incluir_tablas)
+
+# --------------------------------------------------
+# Línea de comandos
+# --------------------------------------------------
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("archivos", nargs="+", help="CSV o GeoJSON de aristas (se leen en orden)")
+    parser.add_argument("--formato", choices=("auto", "csv", "geojson"), default="auto")
+    parser.add_argument("--separador", default=",", help="separador de columnas de los CSV")
+    parser.add_argument("--doble-sentido", action="store_true",
+                        help="agrega también la arista inversa de cada fila CSV")
+    parser.add_argument("--coordenadas", help="CSV lugar, x, y con las coordenadas para A*")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="filas por tramo y por executemany")
+    parser.add_argument("--rechazos", help="CSV donde anotar las filas descartadas y el motivo")
+    parser.add_argument("--modo", choices=("reemplazar", "anadir"), default="reemplazar")
+    parser.add_argument("--sqlite", help="cargar en este archivo SQLite en lugar de MySQL")
+    parser.add_argument("--sin-bd", action="store_true", help="no escribir en la base")
+    parser.add_argument("--load-data", action="store_true",
+                        help="cargar en MySQL con LOAD DATA LOCAL INFILE en lugar de executemany")
+    parser.add_argument("--host", default=DB_CONFIG['host'])
+    parser.add_argument("--usuario", default=DB_CONFIG['user'])
+    parser.add_argument("--base", default=DB_CONFIG['database'])
+    parser.add_argument("--snapshot", help="directorio de la instantánea binaria a escribir")
+    parser.add_argument("--sin-tablas", action="store_true",
+                        help="instantánea sin tabla de rutas ni cierre de componentes")
+    args = parser.parse_args(argumentos)
+    if args.snapshot and args.modo == 'anadir':
+        parser.error("--snapshot necesita el grafo completo: use --modo reemplazar")
+    if args.sin_bd and not args.snapshot:
+        parser.error("--sin-bd sin --snapshot no escribe nada")
+
+    def filas():
+        for archivo in args.archivos:
+            formato = args.formato
+            if formato == 'auto':
+                formato = 'geojson' if archivo.lower().endswith(('.geojson', '.geojsonl', '.geojsons')) \
+                    else 'csv'
+            print(f"Leyendo {archivo} ({formato})...", file=sys.stderr)
+            if formato == 'geojson':
+                yield from leer_geojson(archivo)
+            else:
+                yield from leer_csv(archivo, args.separador, args.doble_sentido)
+
+    inicio = time.perf_counter()
+    archivo_rechazos = open(args.rechazos, 'w', newline='', encoding='utf-8') if args.rechazos else None
+    try:
+        rechazos = None
+        if archivo_rechazos is not None:
+            rechazos = csv.writer(archivo_rechazos)
+            rechazos.writerow(["fila", "origen", "destino", "distancia_km", "adyacente", "motivo"])
+        acumulador, leidas, rechazadas = ingerir(filas(), args.lote, rechazos)
+    finally:
+        if archivo_rechazos is not None:
+            archivo_rechazos.close()
+
+    if args.coordenadas:
+        for lugar, x, y in leer_coordenadas_csv(args.coordenadas, args.separador):
+            try:
+                punto = (float(x), float(y))
+            except (TypeError, ValueError):
+                continue
+            if lugar in acumulador.indice:
+                acumulador.coordenadas[lugar] = punto
+    coordenadas = acumulador.coordenadas
+    lugares, columnas, repetidas = acumulador.columnas()
+    print(f"{leidas} filas leídas, {rechazadas} rechazadas, {repetidas} repetidas; "
+          f"{len(lugares)} lugares y {len(columnas[0])} filas a cargar "
+          f"({time.perf_counter() - inicio:.1f} s)")
+
+    if not args.sin_bd:
+        etapa = time.perf_counter()
+        config = dict(DB_CONFIG, host=args.host, user=args.usuario, database=args.base,
+                      password=os.environ.get('GRAFO_BD_PASSWORD', DB_CONFIG['password']))
+        conn, motor = conectar(args.sqlite, config, args.load_data)
+        try:
+            cargar_base(conn, motor, lugares, columnas, coordenadas, args.modo, args.lote,
+                        args.load_data)
+        finally:
+            conn.close()
+        print(f"Base {args.sqlite or args.base} actualizada ({args.modo}) "
+              f"en {time.perf_counter() - etapa:.1f} s")
+
+    if args.snapshot:
+        etapa = time.perf_counter()
+        manifiesto = escribir_snapshot(args.snapshot, lugares, columnas, coordenadas,
+                                       incluir_tablas=not args.sin_tablas)
+        print(f"Instantánea v{manifiesto['version']} guardada en {args.snapshot}: "
+              f"{manifiesto['lugares']} lugares, {manifiesto['aristas']} aristas "
+              f"({time.perf_counter() - etapa:.1f} s)")
+
+if __name__ == "__main__":
+    main()